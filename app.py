@@ -5,138 +5,107 @@ import json
 import random
 from typing import Dict, List
 
+from instrumentation import StageProfiler
+from knowledge_base import MAPPINGS, generate_validation_tests
+from llm_client import LLMClient
+from sas_io import iter_sas_chunks, read_sas_dataset
+from sketches import MIN_RELATIVE_ERROR
+from snowflake_io import read_snowflake_csv
+from sql_backend import connect_embedded, load_extract, sql_aggregates
+from transforms import normalize_frames
+from results_store import ResultsStore, new_run
+from retrieval_index import RetrievalIndex, context_for_table, sync_knowledge_base
+from upload_cache import UploadCache, content_key
+from validation_engine import compile_plan, execute_plan, rule_aggregate, run_validation, stream_sas_aggregates
+
 #Execution
 #streamlit run app.py
 
 # ---------------------------
-# Common Functions
-# --------------------------
-#Convert the raw byte values (ASCII codes) instead of decoded strings
-def decode_value(x):
-    if isinstance(x, (bytes, bytearray)):
-        #E.g. b'Alice' → decoded to "Alice"
-        #.strip() cleans trailing spaces from SAS fixed-width CHAR fields.
-        return x.decode("utf-8", errors="ignore").strip()
-    if isinstance(x, (list, tuple)) or hasattr(x, "__iter__") and not isinstance(x, str):
-        try:
-            #Example [65,108,105,99,101] → converted to bytes([65,108,105,99,101]) 
-            # = b"Alice" → "Alice"
-            #.strip() cleans trailing spaces from SAS fixed-width CHAR fields.
-            return bytes(x).decode("utf-8", errors="ignore").strip()
-        except Exception:
-            return x
-    return x
-# ---------------------------
+# Streamlit UI
 # ---------------------------
+st.title("🔍 Agentic RAG Migration Validation & Testing (SAS → Snowflake Demo)")
 
 # ---------------------------
-# Simulated Knowledge Base (Mapping + Validation Templates)
+# Parsed uploads survive reruns: one cache per server process
 # ---------------------------
-MAPPINGS = {
-    "customer": {
-        "sas_table": "saslib.customer",
-        "sf_table": "landing.customer",
-        "columns": [
-            {"src": "cust_id", "tgt": "cust_id", "transform": "CAST"},
-            {"src": "first_name", "tgt": "first_name"},
-            {"src": "last_name", "tgt": "last_name"},
-            {"src": "email", "tgt": "email", "pii": True, "masking": "hash_email"},
-            {"src": "birth_dt", "tgt": "birth_dt", "transform": "SAS_DATE_TO_DATE"},
-            {"src": "is_active", "tgt": "is_active", "transform": "0/1 to BOOLEAN"},
-        ],
-    },
-    "transaction": {
-        "sas_table": "saslib.transaction",
-        "sf_table": "landing.transaction",
-        "columns": [
-            {"src": "tran_id", "tgt": "tran_id"},
-            {"src": "cust_id", "tgt": "cust_id"},
-            {"src": "tran_dt", "tgt": "tran_dt", "transform": "SAS_DATETIME_TO_TIMESTAMP"},
-            {"src": "amount", "tgt": "amount"},
-            {"src": "currency", "tgt": "currency"},
-            {"src": "product_id", "tgt": "product_id"},
-        ],
-    },
-}
-
-VALIDATION_TEMPLATES = [
-    {"name": "row_count", "desc": "Row counts should match"},
-    {"name": "sum_amount", "desc": "SUM(amount) should match within tolerance"},
-    {"name": "distinct_cust", "desc": "Distinct customers should match"},
-    {"name": "null_email", "desc": "No null emails allowed"},
-]
+@st.cache_resource
+def upload_cache() -> UploadCache:
+    return UploadCache()
 
-# ---------------------------
-# Helper functions
-# ---------------------------
-def generate_validation_tests(table: str) -> List[Dict]:
-    """Simulate LLM generating tests from templates + mappings"""
-    tests = []
-    if table == "customer":
-        tests.append({"name": "row_count", "sql": "SELECT COUNT(*) FROM landing.customer", "tolerance": 0})
-        tests.append({"name": "null_email", "sql": "SELECT COUNT(*) FROM landing.customer WHERE email IS NULL", "tolerance": 0})
-    if table == "transaction":
-        tests.append({"name": "row_count", "sql": "SELECT COUNT(*) FROM landing.transaction", "tolerance": 0})
-        tests.append({"name": "sum_amount", "sql": "SELECT SUM(amount) FROM landing.transaction", "tolerance": 0.001})
-        tests.append({"name": "distinct_cust", "sql": "SELECT COUNT(DISTINCT cust_id) FROM landing.transaction", "tolerance": 0})
-    return tests
-
-def run_validation(test: Dict, sas_df: pd.DataFrame, sf_df: pd.DataFrame) -> Dict:
-    """Run test by comparing pandas results"""
-    result = {"test_name": test["name"], "status": "PASS", "sas_value": None, "sf_value": None, "explanation": ""}
-
-    if test["name"] == "row_count":
-        result["sas_value"] = len(sas_df)
-        result["sf_value"] = len(sf_df)
-
-    elif test["name"] == "sum_amount":
-        result["sas_value"] = round(sas_df["amount"].sum(), 2)
-        result["sf_value"] = round(sf_df["amount"].sum(), 2)
-
-    elif test["name"] == "distinct_cust":
-        result["sas_value"] = sas_df["cust_id"].nunique()
-        result["sf_value"] = sf_df["cust_id"].nunique()
-
-    elif test["name"] == "null_email":
-        result["sas_value"] = sas_df["email"].isna().sum()
-        result["sf_value"] = sf_df["email"].isna().sum()
-
-    # Compare values
-    if abs(result["sas_value"] - result["sf_value"]) > test["tolerance"]:
-        result["status"] = "FAIL"
-        result["explanation"] = f"Mismatch found: SAS={result['sas_value']} vs Snowflake={result['sf_value']}."
-    else:
-        result["explanation"] = "Validation passed ✅"
-
-    return result
 
-# ---------------------------
-# Streamlit UI
-# ---------------------------
-st.title("🔍 Agentic RAG Migration Validation & Testing (SAS → Snowflake Demo)")
+#Results of every run are kept (indexed by table/rule/column/run time) for the history panel
+@st.cache_resource
+def results_store() -> ResultsStore:
+    return ResultsStore()
+
+#Retrieval index of the knowledge base (mappings, templates, plus any SAS/lineage added with
+#retrieval_index.py); synced once per process, only changed entries are re-indexed
+@st.cache_resource
+def kb_index() -> RetrievalIndex:
+    index = RetrievalIndex()
+    sync_knowledge_base(index)
+    return index
+
+#Failure explanations: cached per failure + context, uncached failures batched into one call
+@st.cache_resource
+def llm_client() -> LLMClient:
+    return LLMClient()
 
 st.sidebar.header("Upload Data")
 sas_file = st.sidebar.file_uploader("Upload SAS dataset (.sas7bdat or .xpt)", type=["sas7bdat", "xpt"])
 sf_file = st.sidebar.file_uploader("Upload Snowflake migrated data (CSV)", type=["csv"])
+sf_schema = st.sidebar.selectbox("Snowflake CSV column types", [None] + list(MAPPINGS), format_func=lambda t: "Infer from data" if t is None else f"From {t} mapping")
+stream_sas = st.sidebar.checkbox("Stream SAS file in chunks (low memory)", value=False)
+sas_chunksize = st.sidebar.number_input("SAS chunk size (rows)", min_value=1_000, value=100_000, step=10_000, disabled=not stream_sas)
+approx_distinct = st.sidebar.checkbox("Approximate distinct counts (HyperLogLog, fixed memory)", value=False)
+approx_error = st.sidebar.number_input("Distinct count relative error", min_value=MIN_RELATIVE_ERROR, max_value=0.1, value=0.01, step=0.005,
+                                       format="%.3f") if approx_distinct else None
+pushdown = st.sidebar.checkbox("Run Snowflake-side test SQL on an embedded SQL engine", value=False)
+trace_memory = st.sidebar.checkbox("Trace Python allocations per stage (slower)", value=False)
 sas_df = None
 sf_df = None
 
+#Wall/CPU time, rows/s and peak memory of every stage of this rerun, shown in the performance panel
+perf = StageProfiler(trace_memory=trace_memory)
+
 if sas_file:
     try:
-        # Pandas will auto-detect format
-        sas_df = pd.read_sas(sas_file, format="sas7bdat")
-
-        #Properly decode SAS character variables
-        sas_df = sas_df.applymap(decode_value)
-        sas_df.columns = sas_df.columns.str.lower()
-        
-        st.success(f"SAS dataset loaded: {sas_df.shape[0]} rows, {sas_df.shape[1]} cols")
+        if stream_sas:
+            #Keep only the first chunk for the preview; validations stream the whole file
+            with perf.stage("sas_preview_chunk") as rec:
+                chunks = iter_sas_chunks(sas_file, chunksize=sas_chunksize)
+                sas_df = next(chunks)
+                chunks.close()
+                rec["rows"] = len(sas_df)
+            st.success(f"SAS dataset opened in streaming mode: previewing first {sas_df.shape[0]} rows, {sas_df.shape[1]} cols")
+        else:
+            #Reuse the parsed frame if these exact bytes were loaded before
+            with perf.stage("sas_cache_lookup"):
+                sas_key = content_key(sas_file.getbuffer(), "sas")
+                sas_df = upload_cache().get(sas_key)
+            if sas_df is not None:
+                st.success(f"SAS dataset loaded from cache: {sas_df.shape[0]} rows, {sas_df.shape[1]} cols")
+            else:
+                #Properly decode SAS character variables (only text columns, vectorized)
+                sas_df, decode_secs = read_sas_dataset(sas_file, perf=perf)
+                upload_cache().put(sas_key, sas_df)
+
+                st.success(f"SAS dataset loaded: {sas_df.shape[0]} rows, {sas_df.shape[1]} cols (decoded in {decode_secs:.2f}s)")
     except Exception as e:
         st.error(f"❌ Error reading SAS dataset: {e}")
 
 if sf_file:
     try:
-        sf_df = pd.read_csv(io.StringIO(sf_file.getvalue().decode("utf-8")))
+        with perf.stage("sf_cache_lookup"):
+            sf_key = content_key(sf_file.getbuffer(), f"sf:{sf_schema}")
+            sf_df = upload_cache().get(sf_key)
+        if sf_df is None:
+            #Parse straight from the upload buffer, typed from the selected mapping
+            with perf.stage("read_snowflake_csv") as rec:
+                sf_df = read_snowflake_csv(sf_file, MAPPINGS.get(sf_schema))
+                rec["rows"] = len(sf_df)
+            upload_cache().put(sf_key, sf_df)
         st.success(f"Snowflake CSV loaded: {sf_df.shape[0]} rows, {sf_df.shape[1]} cols")
     except Exception as e:
         st.error(f"❌ Error reading Snowflake CSV: {e}")
@@ -153,16 +122,62 @@ if sas_df is not None and sf_df is not None:
     st.dataframe(sf_df.head())
 
     # Choose table type
-    table_choice = st.selectbox("Select Table to Validate", ["customer", "transaction"])
+    table_choice = st.selectbox("Select Table to Validate", list(MAPPINGS))
+
+    #Only the context relevant to the selected table is pulled from the knowledge base
+    context = context_for_table(kb_index(), table_choice)
+    with st.expander(f"📚 Retrieved context ({len(context)} documents)"):
+        for doc in context:
+            st.markdown(f"**{doc['id']}** ({doc['kind']}, score {doc['score']})")
+            st.code(doc["text"])
 
     if st.button("🔎 Run Validation"):
         tests = generate_validation_tests(table_choice)
+        if approx_error:
+            #Distinct counts become sketch estimates; run_validation widens their tolerance by the error bound
+            for test in tests:
+                test["approx_error"] = approx_error
+
+        #All tests compile into one plan: a single pass per dataset computes every aggregate
+        #(in streaming mode the SAS pass is chunked over the file instead of the preview)
+        with perf.stage("compile_plan", tests=len(tests)):
+            plan = compile_plan(tests)
+
+        #Apply the mapping's transforms (dates, booleans, casts, masking) so both sides compare like for like
+        with perf.stage("normalize", len(sas_df) + len(sf_df)):
+            sas_n, sf_n = normalize_frames(sas_df, sf_df, MAPPINGS[table_choice])
+
+        #Every aggregate rule runs in this one pass per side
+        with perf.stage("sas_aggregates", tests=len(tests), streamed=stream_sas) as rec:
+            if stream_sas:
+                sas_aggs = stream_sas_aggregates(sas_file, plan, chunksize=sas_chunksize, approx_error=approx_error,
+                                                 mapping=MAPPINGS[table_choice])
+            else:
+                sas_aggs = execute_plan(plan, sas_n, approx_error)
+            #Streamed: the preview is not the whole file, only a planned row count knows the rows read
+            rec["rows"] = sas_aggs.get(("count", None)) if stream_sas else len(sas_n)
+        with perf.stage("sf_aggregates", len(sf_n), tests=len(tests), pushdown=pushdown):
+            if pushdown:
+                #Execute the generated SQL itself against the Snowflake extract
+                con = connect_embedded()
+                load_extract(con, MAPPINGS[table_choice]["sf_table"], sf_n)
+                sf_aggs = sql_aggregates(con, tests)
+                con.close()
+            else:
+                sf_aggs = execute_plan(plan, sf_n, approx_error)
 
         results = []
         for test in tests:
-            result = run_validation(test, sas_df, sf_df)
+            with perf.stage(f"rule:{test['name']}"):
+                result = run_validation(test, sas_aggs, sf_aggs)
             results.append(result)
 
+        #Queued for the background writer; does not wait on disk
+        results_store().append(new_run("app"), table_choice, [
+            {"rule": r["test_name"], "column": (rule_aggregate(test) or (None, None))[1], "status": r["status"],
+             "sas_value": r["sas_value"], "sf_value": r["sf_value"], "explanation": r["explanation"]}
+            for test, r in zip(tests, results)])
+
         results_df = pd.DataFrame(results)
 
         st.subheader("✅ Validation Results")
@@ -176,9 +191,41 @@ if sas_df is not None and sf_df is not None:
         st.metric("Tests Failed", fail_count)
 
         if fail_count > 0:
-            st.warning("⚠️ Some tests failed. LLM explanation could suggest fixes here.")
-            for r in results:
+            st.warning("⚠️ Some tests failed. Suggested fixes below.")
+            failed = [r for r in results if r["status"] == "FAIL"]
+            failures = []
+            for test, r in zip(tests, results):
                 if r["status"] == "FAIL":
-                    st.error(f"❌ {r['test_name']}: {r['explanation']}")
+                    agg, column = rule_aggregate(test) or (None, None)
+                    failures.append({"table": table_choice, "test": r["test_name"], "aggregate": agg, "column": column,
+                                     "sas_value": r["sas_value"], "sf_value": r["sf_value"]})
+            with perf.stage("explain_failures", len(failures)):
+                fixes = llm_client().explain_failures(failures, context)
+            for r, fix in zip(failed, fixes):
+                st.error(f"❌ {r['test_name']}: {r['explanation']}")
+                st.info(f"💡 {fix}")
         else:
             st.success("🎉 All tests passed!")
+
+    with st.expander(f"📈 Validation history: {table_choice}"):
+        store = results_store()
+        store.flush(timeout=5)
+        latest = store.latest_status(table_choice)
+        if latest.empty:
+            st.info("No stored runs for this table yet.")
+        else:
+            st.write("**Latest status per test:**")
+            st.dataframe(latest)
+            drift_rule = st.selectbox("Drift of SAS / Snowflake values for", latest["rule"].tolist())
+            drift = store.drift(table_choice, drift_rule)
+            st.line_chart(drift.set_index("run_ts")[["sas_value", "sf_value"]])
+            st.dataframe(store.history(table_choice, limit=200))
+
+# ---------------------------
+# Performance panel
+# ---------------------------
+if perf.stages:
+    totals = perf.total()
+    with st.expander(f"⏱️ Performance: {totals['wall_s']:.3f}s wall, {totals['cpu_s']:.3f}s CPU over {len(perf.stages)} stages"):
+        st.dataframe(perf.to_frame())
+        st.download_button("⬇️ Export as JSON", perf.to_json(indent=2), file_name="validation_perf.json", mime="application/json")
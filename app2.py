@@ -5,27 +5,21 @@ import json
 import random
 from typing import Dict, List
 
+from instrumentation import StageProfiler
+from knowledge_base import MAPPINGS
+from llm_client import LLMClient
+from row_compare import compare_row_hashes, diff_by_key, merkle_localize
+from sas_io import iter_sas_chunks, read_sas_dataset
+from sketches import MIN_RELATIVE_ERROR
+from snowflake_io import read_snowflake_csv
+from transforms import normalize_frames
+from results_store import ResultsStore, new_run
+from upload_cache import UploadCache, content_key
+from validation_engine import compile_plan, execute_plan, stream_sas_aggregates
+
 #Execution
 #streamlit run app2.py
 
-# ---------------------------
-# Common Functions
-# --------------------------
-#Convert the raw byte values (ASCII codes) instead of decoded strings
-def decode_value(x):
-    if isinstance(x, (bytes, bytearray)):
-        #E.g. b'Alice' → decoded to "Alice"
-        #.strip() cleans trailing spaces from SAS fixed-width CHAR fields.
-        return x.decode("utf-8", errors="ignore").strip()
-    if isinstance(x, (list, tuple)) or hasattr(x, "__iter__") and not isinstance(x, str):
-        try:
-            #Example [65,108,105,99,101] → converted to bytes([65,108,105,99,101]) 
-            # = b"Alice" → "Alice"
-            #.strip() cleans trailing spaces from SAS fixed-width CHAR fields.
-            return bytes(x).decode("utf-8", errors="ignore").strip()
-        except Exception:
-            return x
-    return x
 # ---------------------------
 # Session state initialization
 # ---------------------------
@@ -33,74 +27,16 @@ if "validations_list" not in st.session_state:
     st.session_state.validations_list = []
 
 # ---------------------------
-# Helper function: fake LLM suggestions (replace with real LLM call)
-# ---------------------------
-def suggest_columns_for_rule(rule, df):
-    numeric_cols = df.select_dtypes(include="number").columns.tolist()
-    string_cols = df.select_dtypes(include="object").columns.tolist()
-    
-    if rule == "sum_amount":
-        return numeric_cols[:3]  # top 3 numeric candidates
-    elif rule == "distinct_count":
-        return string_cols[:3]   # top 3 categorical candidates
-    elif rule == "not_null":
-        return df.columns[:5].tolist()  # suggest first 5 columns
-    elif rule == "uniqueness":
-        return string_cols[:2] + numeric_cols[:1]
-    return []
+# Helper function: LLM column suggestions (cached per rule + column layout, so reruns cost nothing)
 # ---------------------------
+@st.cache_resource
+def llm_client() -> LLMClient:
+    return LLMClient()
 
-# ---------------------------
-# Simulated Knowledge Base (Mapping + Validation Templates)
-# ---------------------------
-MAPPINGS = {
-    "customer": {
-        "sas_table": "saslib.customer",
-        "sf_table": "landing.customer",
-        "columns": [
-            {"src": "cust_id", "tgt": "cust_id", "transform": "CAST"},
-            {"src": "first_name", "tgt": "first_name"},
-            {"src": "last_name", "tgt": "last_name"},
-            {"src": "email", "tgt": "email", "pii": True, "masking": "hash_email"},
-            {"src": "birth_dt", "tgt": "birth_dt", "transform": "SAS_DATE_TO_DATE"},
-            {"src": "is_active", "tgt": "is_active", "transform": "0/1 to BOOLEAN"},
-        ],
-    },
-    "transaction": {
-        "sas_table": "saslib.transaction",
-        "sf_table": "landing.transaction",
-        "columns": [
-            {"src": "tran_id", "tgt": "tran_id"},
-            {"src": "cust_id", "tgt": "cust_id"},
-            {"src": "tran_dt", "tgt": "tran_dt", "transform": "SAS_DATETIME_TO_TIMESTAMP"},
-            {"src": "amount", "tgt": "amount"},
-            {"src": "currency", "tgt": "currency"},
-            {"src": "product_id", "tgt": "product_id"},
-        ],
-    },
-}
-
-VALIDATION_TEMPLATES = [
-    {"name": "row_count", "desc": "Row counts should match"},
-    {"name": "sum_amount", "desc": "SUM(amount) should match within tolerance"},
-    {"name": "distinct_cust", "desc": "Distinct customers should match"},
-    {"name": "null_email", "desc": "No null emails allowed"},
-]
 
+def suggest_columns_for_rule(rule, df):
+    return llm_client().suggest_columns(rule, df)
 # ---------------------------
-# Helper functions
-# ---------------------------
-def generate_validation_tests(table: str) -> List[Dict]:
-    """Simulate LLM generating tests from templates + mappings"""
-    tests = []
-    if table == "customer":
-        tests.append({"name": "row_count", "sql": "SELECT COUNT(*) FROM landing.customer", "tolerance": 0})
-        tests.append({"name": "null_email", "sql": "SELECT COUNT(*) FROM landing.customer WHERE email IS NULL", "tolerance": 0})
-    if table == "transaction":
-        tests.append({"name": "row_count", "sql": "SELECT COUNT(*) FROM landing.transaction", "tolerance": 0})
-        tests.append({"name": "sum_amount", "sql": "SELECT SUM(amount) FROM landing.transaction", "tolerance": 0.001})
-        tests.append({"name": "distinct_cust", "sql": "SELECT COUNT(DISTINCT cust_id) FROM landing.transaction", "tolerance": 0})
-    return tests
 
 # ---------------------------
 # Streamlit UI
@@ -117,28 +53,72 @@ if st.sidebar.button("🔄 Reset App"):
         del st.session_state[key]
     st.rerun()
 
+# ---------------------------
+# Parsed uploads survive reruns: one cache per server process
+# ---------------------------
+@st.cache_resource
+def upload_cache() -> UploadCache:
+    return UploadCache()
+
+
+#Results of every run are kept (indexed by table/rule/column/run time) for the history panel
+@st.cache_resource
+def results_store() -> ResultsStore:
+    return ResultsStore()
+
 st.sidebar.header("Upload Data")
 sas_file = st.sidebar.file_uploader("Upload SAS dataset (.sas7bdat or .xpt)", type=["sas7bdat", "xpt"])
 sf_file = st.sidebar.file_uploader("Upload Snowflake migrated data (CSV)", type=["csv"])
+sf_schema = st.sidebar.selectbox("Snowflake CSV column types", [None] + list(MAPPINGS), format_func=lambda t: "Infer from data" if t is None else f"From {t} mapping")
+stream_sas = st.sidebar.checkbox("Stream SAS file in chunks (low memory)", value=False)
+sas_chunksize = st.sidebar.number_input("SAS chunk size (rows)", min_value=1_000, value=100_000, step=10_000, disabled=not stream_sas)
+approx_distinct = st.sidebar.checkbox("Approximate distinct counts (HyperLogLog, fixed memory)", value=False)
+approx_error = st.sidebar.number_input("Distinct count relative error", min_value=MIN_RELATIVE_ERROR, max_value=0.1, value=0.01, step=0.005,
+                                       format="%.3f") if approx_distinct else None
+trace_memory = st.sidebar.checkbox("Trace Python allocations per stage (slower)", value=False)
 sas_df = None
 sf_df = None
 
+#Wall/CPU time, rows/s and peak memory of every stage of this rerun, shown in the performance panel
+perf = StageProfiler(trace_memory=trace_memory)
+
 if sas_file:
     try:
-        # Pandas will auto-detect format
-        sas_df = pd.read_sas(sas_file, format="sas7bdat")
-
-        #Properly decode SAS character variables
-        sas_df = sas_df.map(decode_value)
-        sas_df.columns = sas_df.columns.str.lower()
-        
-        st.success(f"SAS dataset loaded: {sas_df.shape[0]} rows, {sas_df.shape[1]} cols")
+        if stream_sas:
+            #Keep only the first chunk for the preview; validations stream the whole file
+            with perf.stage("sas_preview_chunk") as rec:
+                chunks = iter_sas_chunks(sas_file, chunksize=sas_chunksize)
+                sas_df = next(chunks)
+                chunks.close()
+                rec["rows"] = len(sas_df)
+            st.success(f"SAS dataset opened in streaming mode: previewing first {sas_df.shape[0]} rows, {sas_df.shape[1]} cols")
+        else:
+            #Reuse the parsed frame if these exact bytes were loaded before
+            with perf.stage("sas_cache_lookup"):
+                sas_key = content_key(sas_file.getbuffer(), "sas")
+                sas_df = upload_cache().get(sas_key)
+            if sas_df is not None:
+                st.success(f"SAS dataset loaded from cache: {sas_df.shape[0]} rows, {sas_df.shape[1]} cols")
+            else:
+                #Properly decode SAS character variables (only text columns, vectorized)
+                sas_df, decode_secs = read_sas_dataset(sas_file, perf=perf)
+                upload_cache().put(sas_key, sas_df)
+
+                st.success(f"SAS dataset loaded: {sas_df.shape[0]} rows, {sas_df.shape[1]} cols (decoded in {decode_secs:.2f}s)")
     except Exception as e:
         st.error(f"❌ Error reading SAS dataset: {e}")
 
 if sf_file:
     try:
-        sf_df = pd.read_csv(io.StringIO(sf_file.getvalue().decode("utf-8")))
+        with perf.stage("sf_cache_lookup"):
+            sf_key = content_key(sf_file.getbuffer(), f"sf:{sf_schema}")
+            sf_df = upload_cache().get(sf_key)
+        if sf_df is None:
+            #Parse straight from the upload buffer, typed from the selected mapping
+            with perf.stage("read_snowflake_csv") as rec:
+                sf_df = read_snowflake_csv(sf_file, MAPPINGS.get(sf_schema))
+                rec["rows"] = len(sf_df)
+            upload_cache().put(sf_key, sf_df)
         st.success(f"Snowflake CSV loaded: {sf_df.shape[0]} rows, {sf_df.shape[1]} cols")
     except Exception as e:
         st.error(f"❌ Error reading Snowflake CSV: {e}")
@@ -162,11 +142,12 @@ if sas_df is not None and sf_df is not None:
     with col1:
         rule = st.selectbox(
             "Select Validation Type",
-            ["Row Count", "Row Hash", "Sum Amount", "Distinct Count", "Uniqueness", "Not Null"],
+            ["Row Count", "Row Hash", "Key Diff", "Sum Amount", "Distinct Count", "Uniqueness", "Not Null"],
             key="rule_select"
         )
 
     selected_col = None
+    selected_keys = None
     hash_file = None
 
     with col2:
@@ -178,6 +159,15 @@ if sas_df is not None and sf_df is not None:
                 index=0 if suggestions == [] else sas_df.columns.get_loc(suggestions[0]),
                 key="col_select"
             )
+        elif rule == "Key Diff":
+            #Default to the key columns declared in the selected mapping
+            mapping_keys = [k.lower() for k in MAPPINGS.get(sf_schema, {}).get("keys", [])]
+            selected_keys = st.multiselect(
+                "Key Columns",
+                options=sf_df.columns,
+                default=[c for c in sf_df.columns if c.lower() in mapping_keys],
+                key="key_select"
+            )
 
     if rule == "Row Hash":
         hash_file = st.file_uploader("Upload SAS Hash File", type=["csv"], key="hash_upload")
@@ -186,6 +176,8 @@ if sas_df is not None and sf_df is not None:
         new_val = {"rule": rule}
         if selected_col:
             new_val["column"] = selected_col
+        if selected_keys:
+            new_val["keys"] = selected_keys
         if hash_file:
             new_val["hash_df"] = pd.read_csv(hash_file)
 
@@ -206,46 +198,144 @@ if sas_df is not None and sf_df is not None:
     # ---------------------------
     # Run Validations
     # ---------------------------
+    localize = st.checkbox("🌳 Localize mismatching rows when Row Count / Sum fails (bucket hashing on the mapping keys)", key="localize")
+
     if st.button("🚀 Run All Validations"):
         results = []
 
+        #All rules compile into one plan: a single pass per dataset computes every aggregate
+        #(in streaming mode the SAS pass is chunked over the file instead of the preview)
+        with perf.stage("compile_plan", validations=len(st.session_state.validations_list)):
+            plan = compile_plan(st.session_state.validations_list)
+
+        #Apply the selected mapping's transforms (dates, booleans, casts, masking) to both sides
+        with perf.stage("normalize", len(sas_df) + len(sf_df)):
+            sas_n, sf_n = normalize_frames(sas_df, sf_df, MAPPINGS.get(sf_schema))
+
+        #Every aggregate rule (counts, sums, distinct, nulls, uniqueness) runs in this one pass per side
+        with perf.stage("sas_aggregates", streamed=stream_sas) as rec:
+            if stream_sas:
+                sas_aggs = stream_sas_aggregates(sas_file, plan, chunksize=sas_chunksize, approx_error=approx_error,
+                                                 mapping=MAPPINGS.get(sf_schema))
+            else:
+                sas_aggs = execute_plan(plan, sas_n, approx_error)
+            #Streamed: the preview is not the whole file, only a planned row count knows the rows read
+            rec["rows"] = sas_aggs.get(("count", None)) if stream_sas else len(sas_n)
+        with perf.stage("sf_aggregates", len(sf_n)):
+            sf_aggs = execute_plan(plan, sf_n, approx_error)
+
+        row_hash_details = []
+        key_diff_details = []
         for val in st.session_state.validations_list:
             rule = val["rule"]
-
-            if rule == "Row Count":
-                rc_sas, rc_sf = len(sas_df), len(sf_df)
-                status = "PASS" if rc_sas == rc_sf else "FAIL"
-                results.append({"Test": "Row Count", "Column": "NA", "SAS Row Count": rc_sas, "SF Row Count": rc_sf, "Status": status})
-
-            elif rule == "Sum Amount":
-                col = val["column"]
-                sa_sas, sa_sf = sas_df[col].astype(float).sum(), sf_df[col].astype(float).sum()
-                status = "PASS" if abs(sa_sas - sa_sf) < 0.01 else "FAIL"
-                results.append({"Test": "Sum", "Column": col, "SAS Row Count": sa_sas, "SF Row Count": sa_sf, "Status": status})
-
-            elif rule == "Distinct Count":
-                col = val["column"]
-                dc_sas, dc_sf = sas_df[col].nunique(), sf_df[col].nunique()
-                status = "PASS" if dc_sas == dc_sf else "FAIL"
-                results.append({"Test": "Distinct", "Column": col, "SAS Row Count": dc_sas, "SF Row Count": dc_sf, "Status": status})
-
-            elif rule == "Not Null":
-                col = val["column"]
-                nn_sas, nn_sf = sas_df[col].isna().sum(), sf_df[col].isna().sum()
-                status = "PASS" if nn_sas == nn_sf == 0 else "FAIL"
-                results.append({"Test": "Not Null", "Column": col, "SAS Row Count": nn_sas, "SF Row Count": nn_sf, "Status": status})
-
-            elif rule == "Uniqueness":
-                col = val["column"]
-                uq_sas, uq_sf = sas_df[col].is_unique, sf_df[col].is_unique
-                status = "PASS" if uq_sas and uq_sf else "FAIL"
-                results.append({"Test": "Uniqueness", "Column": col, "SAS Row Count": uq_sas, "SF Row Count": uq_sf, "Status": status})
-
-            elif rule == "Row Hash":
-                hash_df = val["hash_df"]
-                match = hash_df.equals(sf_df)
-                status = "PASS" if match else "FAIL"
-                results.append({"Test": "Row Hash", "Column": "NA", "SAS Row Count": len(hash_df), "SF Row Count": len(sf_df), "Status": status})
+            with perf.stage(f"rule:{rule}", column=val.get("column")):
+                if rule == "Row Count":
+                    rc_sas, rc_sf = sas_aggs[("count", None)], sf_aggs[("count", None)]
+                    status = "PASS" if rc_sas == rc_sf else "FAIL"
+                    results.append({"Test": "Row Count", "Column": "NA", "SAS Row Count": rc_sas, "SF Row Count": rc_sf, "Status": status})
+
+                elif rule == "Sum Amount":
+                    col = val["column"]
+                    sa_sas, sa_sf = sas_aggs[("sum", col)], sf_aggs[("sum", col)]
+                    status = "PASS" if abs(sa_sas - sa_sf) < 0.01 else "FAIL"
+                    results.append({"Test": "Sum", "Column": col, "SAS Row Count": sa_sas, "SF Row Count": sa_sf, "Status": status})
+
+                elif rule == "Distinct Count":
+                    col = val["column"]
+                    dc_sas, dc_sf = sas_aggs[("nunique", col)], sf_aggs[("nunique", col)]
+                    #Sketch estimates may each be off by approx_error
+                    tolerance = approx_error * (dc_sas + dc_sf) if approx_error else 0
+                    status = "PASS" if abs(dc_sas - dc_sf) <= tolerance else "FAIL"
+                    results.append({"Test": "Distinct", "Column": col, "SAS Row Count": dc_sas, "SF Row Count": dc_sf, "Status": status})
+
+                elif rule == "Not Null":
+                    col = val["column"]
+                    nn_sas, nn_sf = sas_aggs[("nulls", col)], sf_aggs[("nulls", col)]
+                    status = "PASS" if nn_sas == nn_sf == 0 else "FAIL"
+                    results.append({"Test": "Not Null", "Column": col, "SAS Row Count": nn_sas, "SF Row Count": nn_sf, "Status": status})
+
+                elif rule == "Uniqueness":
+                    col = val["column"]
+                    uq_sas, uq_sf = sas_aggs[("unique", col)], sf_aggs[("unique", col)]
+                    status = "PASS" if uq_sas and uq_sf else "FAIL"
+                    results.append({"Test": "Uniqueness", "Column": col, "SAS Row Count": uq_sas, "SF Row Count": uq_sf, "Status": status})
+
+                elif rule == "Row Hash":
+                    #Compare against the uploaded SAS hash file, else against the SAS dataset itself
+                    hash_df = val.get("hash_df")
+                    if hash_df is None and stream_sas:
+                        st.warning("⚠️ Row Hash needs the full SAS dataset: upload a SAS hash file or disable streaming mode.")
+                        continue
+                    cmp = compare_row_hashes(sas_df if hash_df is None else hash_df, sf_df, MAPPINGS.get(sf_schema))
+                    status = "PASS" if cmp["missing"] == cmp["extra"] == cmp["changed"] == 0 else "FAIL"
+                    results.append({"Test": "Row Hash", "Column": ", ".join(cmp["key_columns"]) or "NA", "SAS Row Count": cmp["sas_rows"], "SF Row Count": cmp["sf_rows"], "Status": status})
+                    row_hash_details.append(cmp)
+
+                elif rule == "Key Diff":
+                    #Both sides are partitioned by key hash on disk and compared partition by partition
+                    sas_side = iter_sas_chunks(sas_file, chunksize=sas_chunksize) if stream_sas else sas_df
+                    diff = diff_by_key(sas_side, sf_df, MAPPINGS.get(sf_schema), key_columns=val.get("keys"))
+                    status = "PASS" if diff["missing"] == diff["extra"] == diff["changed_rows"] == 0 else "FAIL"
+                    results.append({"Test": "Key Diff", "Column": ", ".join(diff["key_columns"]), "SAS Row Count": diff["rows_compared"] + diff["missing"], "SF Row Count": diff["rows_compared"] + diff["extra"], "Status": status})
+                    key_diff_details.append(diff)
+
+        #Queued for the background writer; does not wait on disk
+        results_table = sf_schema or sf_file.name.rsplit(".", 1)[0]
+        results_store().append(new_run("app2"), results_table, [
+            {"rule": r["Test"], "column": None if r["Column"] == "NA" else r["Column"], "status": r["Status"],
+             "sas_value": r["SAS Row Count"], "sf_value": r["SF Row Count"]}
+            for r in results])
 
         st.subheader("✅ Validation Results")
         st.dataframe(pd.DataFrame(results))
+
+        for cmp in row_hash_details:
+            with st.expander(f"🔑 Row Hash details: {cmp['matched']} matched, {cmp['missing']} missing, {cmp['extra']} extra, {cmp['changed']} changed"):
+                for label, key in (("Missing in Snowflake", "missing_keys"), ("Extra in Snowflake", "extra_keys"), ("Changed", "changed_keys")):
+                    if len(cmp[key]):
+                        st.write(f"**{label}:**")
+                        st.dataframe(cmp[key].head(1000))
+
+        for diff in key_diff_details:
+            with st.expander(f"🧩 Key Diff details: {diff['missing']} missing, {diff['extra']} extra, {diff['changed_rows']} changed rows"):
+                if diff["column_mismatches"]:
+                    st.write("**Mismatching cells per column:**", diff["column_mismatches"])
+                st.dataframe(diff["report"].head(1000))
+
+        #Drill down into the rows behind a failed count/sum, comparing bucket digests top-down
+        count_or_sum_failed = any(r["Test"] in ("Row Count", "Sum") and r["Status"] == "FAIL" for r in results)
+        if localize and count_or_sum_failed:
+            mapping = MAPPINGS.get(sf_schema)
+            if stream_sas or not (mapping or {}).get("keys"):
+                st.info("Localization needs the full SAS dataset and a column mapping with keys.")
+            else:
+                with perf.stage("localize", len(sas_df) + len(sf_df)):
+                    loc = merkle_localize(sas_df, sf_df, mapping)
+                with st.expander(f"🌳 Localized: {loc['missing']} missing, {loc['extra']} extra, {loc['changed']} changed ({loc['buckets_compared']} buckets, {loc['rows_examined']} rows examined)"):
+                    for label, key in (("Missing in Snowflake", "missing_keys"), ("Extra in Snowflake", "extra_keys"), ("Changed", "changed_keys")):
+                        if len(loc[key]):
+                            st.write(f"**{label}:**")
+                            st.dataframe(loc[key].head(1000))
+
+    with st.expander("📈 Validation history"):
+        store = results_store()
+        store.flush(timeout=5)
+        history_table = sf_schema or sf_file.name.rsplit(".", 1)[0]
+        latest = store.latest_status(history_table)
+        if latest.empty:
+            st.info(f"No stored runs for {history_table} yet.")
+        else:
+            st.write(f"**Latest status per rule ({history_table}):**")
+            st.dataframe(latest)
+            st.write("**Pass / fail per table:**")
+            st.dataframe(store.pass_rate())
+            st.dataframe(store.history(history_table, limit=200))
+
+# ---------------------------
+# Performance panel
+# ---------------------------
+if perf.stages:
+    totals = perf.total()
+    with st.expander(f"⏱️ Performance: {totals['wall_s']:.3f}s wall, {totals['cpu_s']:.3f}s CPU over {len(perf.stages)} stages"):
+        st.dataframe(perf.to_frame())
+        st.download_button("⬇️ Export as JSON", perf.to_json(indent=2), file_name="validation_perf.json", mime="application/json")
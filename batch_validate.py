@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from incremental import PartitionStore, file_version, validate_incremental
+from knowledge_base import MAPPINGS, generate_validation_tests
+from lineage_graph import LineageGraph
+from lineage_reader import read_lineage
+from lineage_scheduler import UPSTREAM_FAILURE_MODES, error_nodes, run_scheduled, table_dependencies, table_failed
+from results_store import ResultsStore, new_run
+from sas_io import ensure_columnar, iter_sas_chunks, read_columnar
+from snowflake_io import iter_snowflake_csv_chunks
+from sketches import MIN_RELATIVE_ERROR
+from sql_backend import embedded_pool, load_extract, run_batched
+from transforms import compile_mapping, normalize_side
+from validation_engine import TEST_AGGREGATES, RunningAggregates, compile_plan, execute_plan, run_validation, stream_sas_aggregates
+
+#Execution
+#python batch_validate.py --sas-dir sample_data/sas --sf-dir sample_data/sf --output results.json
+#python batch_validate.py --sas-dir sample_data/sas --sf-dir sample_data/sf --lineage snowflake_lineage.json
+#Exit code: 0 = all tests passed, 1 = at least one FAIL or ERROR, 2 = bad arguments
+
+# ---------------------------
+# Locating the extracts of a table
+# ---------------------------
+def _find_file(directory: str, names: List[str], suffixes: List[str]) -> Optional[str]:
+    """First file in directory whose name (case-insensitive) is one of names + one of suffixes"""
+    by_lower = {f.lower(): f for f in os.listdir(directory)}
+    for name in names:
+        for suffix in suffixes:
+            found = by_lower.get(f"{name}{suffix}".lower())
+            if found:
+                return os.path.join(directory, found)
+    return None
+
+
+def table_files(table: str, sas_dir: str, sf_dir: str) -> Dict[str, Optional[str]]:
+    """SAS/Snowflake extract of a MAPPINGS table, named after the table or its sas_table/sf_table"""
+    mapping = MAPPINGS[table]
+    sas_names = [table, mapping["sas_table"].split(".")[-1]]
+    sf_names = [table, mapping["sf_table"].split(".")[-1]]
+    return {
+        "sas": _find_file(sas_dir, sas_names, [".sas7bdat"]),
+        "sf": _find_file(sf_dir, sf_names, [".csv"]),
+    }
+
+
+# ---------------------------
+# Worker: validate one table
+# ---------------------------
+def validate_table(table: str, sas_path: str, sf_path: str, chunksize: int = 100_000, columnar: bool = False,
+                   sf_aggs: Optional[Dict] = None, approx_error: Optional[float] = None,
+                   incremental_store: Optional[str] = None) -> Dict:
+    """
+    Run every generated test of a table; both sides are streamed so a worker holds one chunk at a time.
+    sf_aggs, when given, are the Snowflake-side values already computed by pushed-down SQL.
+    approx_error switches distinct counts to HyperLogLog sketches within that relative error.
+    With incremental_store, partitioned tables (mapping "partition_by") reuse the per-partition
+    aggregates stored there and only recompute new or changed partitions.
+    """
+    start = time.perf_counter()
+    tests = generate_validation_tests(table)
+    mapping = MAPPINGS[table]
+    if incremental_store and mapping.get("partition_by"):
+        if columnar:
+            sas_source = lambda: [read_columnar(ensure_columnar(sas_path))]
+        else:
+            sas_source = lambda: iter_sas_chunks(sas_path, chunksize=chunksize)
+        sf_source = lambda: iter_snowflake_csv_chunks(sf_path, mapping, chunksize=chunksize)
+        store = PartitionStore(incremental_store)
+        try:
+            #Unchanged files (same size and mtime as last run) are not read again
+            report = validate_incremental(store, table, tests, sas_source, sf_source, mapping, approx_error, sf_aggs,
+                                          sas_version=file_version(sas_path), sf_version=file_version(sf_path))
+        finally:
+            store.close()
+        return {"table": table, **report, "seconds": round(time.perf_counter() - start, 3)}
+
+    if approx_error:
+        for test in tests:
+            test["approx_error"] = approx_error
+    plan = compile_plan(tests)
+    #Both sides get the mapping's transforms (casts, booleans, dates, masking), as in the apps
+    converters = compile_mapping(mapping)
+
+    if columnar:
+        #Reuse (or create once) the memory-mapped copy and read only the columns the plan needs
+        columns = [c for c in plan if c is not None]
+        sas_df = normalize_side(read_columnar(ensure_columnar(sas_path), columns=columns), mapping, "sas", converters)
+        sas_aggs = execute_plan(plan, sas_df, approx_error)
+    else:
+        sas_aggs = stream_sas_aggregates(sas_path, plan, chunksize=chunksize, approx_error=approx_error, mapping=mapping)
+
+    if sf_aggs is None:
+        sf_running = RunningAggregates(plan, approx_error)
+        for chunk in iter_snowflake_csv_chunks(sf_path, mapping, chunksize=chunksize):
+            chunk.columns = chunk.columns.str.lower()
+            sf_running.update(normalize_side(chunk, mapping, "sf", converters))
+        sf_aggs = sf_running.result()
+
+    results = [run_validation(test, sas_aggs, sf_aggs) for test in tests]
+    return {"table": table, "results": results, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def _json_default(value):
+    #numpy scalars coming out of the pandas aggregates
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Not JSON serializable: {type(value)}")
+
+
+def record_results(path: str, table_results: List[Dict]) -> None:
+    """Append one batch run to the results store (table errors are recorded as ERROR rows)"""
+    store = ResultsStore(path)
+    run = new_run("batch")
+    for t in table_results:
+        if "error" in t:
+            rows = [{"rule": "load", "status": "ERROR", "explanation": t["error"]}]
+        else:
+            rows = [{"rule": r["test_name"], "column": TEST_AGGREGATES.get(r["test_name"], (None, None))[1], **r}
+                    for r in t["results"]]
+        store.append(run, t["table"], rows)
+    store.close()
+
+
+def run_batch(tables: List[str], sas_dir: str, sf_dir: str, workers: Optional[int] = None,
+              chunksize: int = 100_000, columnar: bool = False, pushdown: bool = False,
+              approx_error: Optional[float] = None, incremental_store: Optional[str] = None,
+              lineage: Optional[LineageGraph] = None, on_upstream_failure: str = "skip") -> Dict:
+    """
+    Validate all tables concurrently on a process pool; missing extracts and worker errors become ERROR entries.
+    With pushdown the Snowflake extracts are loaded into one embedded SQL engine and the tests' SQL
+    runs there, batched into one query per table and concurrently across tables.
+    With a lineage graph, tables run in its topological order (see lineage_scheduler): tables
+    downstream of a failed one are skipped or deprioritized, and the failed lineage nodes are
+    reported as error_tables.
+    """
+    started = datetime.now(timezone.utc).isoformat()
+    table_results = {}
+    files_by_table = {}
+    for table in tables:
+        files = table_files(table, sas_dir, sf_dir)
+        if files["sas"] is None or files["sf"] is None:
+            missing = [side for side, path in files.items() if path is None]
+            table_results[table] = {"table": table, "error": f"Extract not found for: {', '.join(missing)}", "results": []}
+        else:
+            files_by_table[table] = files
+
+    sf_values = {}
+    if pushdown and files_by_table:
+        sql_pool = embedded_pool()
+        try:
+            for table, files in list(files_by_table.items()):
+                try:
+                    with sql_pool.connection() as con:
+                        load_extract(con, MAPPINGS[table]["sf_table"], files["sf"])
+                except Exception as e:
+                    table_results[table] = {"table": table, "error": f"{type(e).__name__}: {e}", "results": []}
+                    del files_by_table[table]
+            sf_values, sql_errors = run_batched(sql_pool, {t: generate_validation_tests(t) for t in files_by_table})
+            for table, error in sql_errors.items():
+                table_results[table] = {"table": table, "error": error, "results": []}
+                del files_by_table[table]
+        finally:
+            sql_pool.close()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if lineage is not None:
+            def submit(table):
+                if table in table_results:
+                    #Failed before validation (missing extract, load error): still blocks its downstream tables
+                    future = Future()
+                    future.set_result(table_results[table])
+                    return future
+                files = files_by_table[table]
+                return pool.submit(validate_table, table, files["sas"], files["sf"], chunksize, columnar,
+                                   sf_values.get(table), approx_error, incremental_store)
+
+            table_results.update(run_scheduled(table_dependencies(lineage, tables), submit,
+                                               workers or os.cpu_count() or 1, table_failed, on_upstream_failure))
+            files_by_table = {}
+
+        futures = {}
+        for table, files in files_by_table.items():
+            futures[pool.submit(validate_table, table, files["sas"], files["sf"], chunksize, columnar, sf_values.get(table),
+                                 approx_error, incremental_store)] = table
+
+        for future in as_completed(futures):
+            table = futures[future]
+            try:
+                table_results[table] = future.result()
+            except Exception as e:
+                table_results[table] = {"table": table, "error": f"{type(e).__name__}: {e}", "results": []}
+
+    statuses = [r["status"] for t in table_results.values() for r in t["results"]]
+    summary = {
+        "tables": len(tables),
+        "table_errors": sum(1 for t in table_results.values() if "error" in t),
+        "tests": len(statuses),
+        "passed": statuses.count("PASS"),
+        "failed": statuses.count("FAIL"),
+    }
+    report = {"started": started, "finished": datetime.now(timezone.utc).isoformat(), "summary": summary,
+              "tables": [table_results[t] for t in tables]}
+    if lineage is not None:
+        summary["skipped"] = sum(1 for t in table_results.values() if "skipped" in t)
+        report["error_tables"] = error_nodes(lineage, table_results)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Validate every MAPPINGS table: SAS extracts vs Snowflake CSV exports")
+    parser.add_argument("--sas-dir", required=True, help="Directory with <table>.sas7bdat files")
+    parser.add_argument("--sf-dir", required=True, help="Directory with <table>.csv Snowflake exports")
+    parser.add_argument("--tables", nargs="*", default=None, help="Tables to validate (default: all in MAPPINGS)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Rows per streamed chunk")
+    parser.add_argument("--columnar", action="store_true", help="Read SAS data from cached Arrow copies (created on first run)")
+    parser.add_argument("--pushdown", action="store_true", help="Run the Snowflake-side test SQL on an embedded SQL engine (batched per table, tables concurrently)")
+    parser.add_argument("--approx-distinct", type=float, default=None, metavar="ERR",
+                        help="Approximate distinct counts with HyperLogLog sketches within relative error ERR (e.g. 0.01)")
+    parser.add_argument("--incremental", default=None, metavar="STORE",
+                        help="SQLite file with per-partition aggregates; partitioned tables only recompute new/changed partitions")
+    parser.add_argument("--results-db", default=None, metavar="DB",
+                        help="Append the results to this SQLite results store (query it with results_store.py)")
+    parser.add_argument("--lineage", default=None, metavar="JSON",
+                        help="Collibra-style or SAS DI lineage JSON: validate tables in lineage order, independent branches in parallel")
+    parser.add_argument("--on-upstream-failure", choices=UPSTREAM_FAILURE_MODES, default="skip",
+                        help="With --lineage: skip tables downstream of a failed table, or validate them last")
+    parser.add_argument("--output", default="-", help="Results JSON file ('-' = stdout)")
+    args = parser.parse_args(argv)
+
+    tables = args.tables or list(MAPPINGS)
+    unknown = [t for t in tables if t not in MAPPINGS]
+    if unknown:
+        parser.error(f"Unknown tables (not in MAPPINGS): {unknown}")
+    if args.approx_distinct is not None and not MIN_RELATIVE_ERROR <= args.approx_distinct < 1:
+        parser.error(f"--approx-distinct must be between {MIN_RELATIVE_ERROR} (the sketch's finest precision) and 1")
+
+    lineage = None
+    if args.lineage:
+        lineage = read_lineage(args.lineage).to_graph()
+
+    report = run_batch(tables, args.sas_dir, args.sf_dir, args.workers, args.chunksize, args.columnar, args.pushdown,
+                       args.approx_distinct, args.incremental, lineage, args.on_upstream_failure)
+    if args.results_db:
+        record_results(args.results_db, report["tables"])
+    payload = json.dumps(report, indent=2, default=_json_default)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+
+    summary = report["summary"]
+    print(f"{summary['passed']}/{summary['tests']} tests passed, {summary['failed']} failed, "
+          f"{summary['table_errors']} table errors" + (f", {summary['skipped']} tables skipped" if "skipped" in summary else ""),
+          file=sys.stderr)
+    return 0 if summary["failed"] == 0 and summary["table_errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
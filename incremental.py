@@ -0,0 +1,326 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from row_compare import _column_kind, _normalize_column
+from transforms import compile_mapping, normalize_side
+from validation_engine import RunningAggregates, compile_plan, run_validation
+
+# ---------------------------
+# Incremental, partition-level validation
+# ---------------------------
+#Tables like daily_balance / monthly_amb grow by partition. Each partition's running
+#aggregates (count, sums, nulls, distinct sketch/set, row-hash digest) are persisted with a
+#fingerprint; the next run only recomputes partitions that are new or changed. An unchanged source
+#file (size + mtime) is not read at all; a changed one is fingerprinted per partition by a hash of
+#its raw rows, plus the latest value of the mapping's "updated_at" column when it has one.
+#Distinct counts stay exact (per-partition sets merge losslessly) unless a sketch error is asked for.
+
+Source = Union[pd.DataFrame, Callable[[], Iterable[pd.DataFrame]]]
+
+
+class PartitionStore:
+    """Per-partition aggregates of every table/side in one local SQLite file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        #Several batch workers may write to the same store; wait for their locks instead of failing
+        self.con = sqlite3.connect(path, timeout=60)
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS partition_aggregates ("
+            " table_name TEXT, side TEXT, plan_key TEXT, partition TEXT,"
+            " fingerprint TEXT, row_digest TEXT, rows INTEGER, computed_at TEXT, state BLOB,"
+            " PRIMARY KEY (table_name, side, plan_key, partition))"
+        )
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS source_versions ("
+            " table_name TEXT, side TEXT, plan_key TEXT, version TEXT, PRIMARY KEY (table_name, side, plan_key))"
+        )
+        self.con.commit()
+
+    def load(self, table: str, side: str, plan_key: str) -> Dict[str, Tuple[str, int, RunningAggregates]]:
+        """{partition: (fingerprint, row digest, running aggregates)} stored for one side of a table"""
+        rows = self.con.execute(
+            "SELECT partition, fingerprint, row_digest, state FROM partition_aggregates"
+            " WHERE table_name = ? AND side = ? AND plan_key = ?", (table, side, plan_key))
+        return {part: (fp, int(digest, 16), pickle.loads(state)) for part, fp, digest, state in rows}
+
+    def save(self, table: str, side: str, plan_key: str, entries: Dict[str, Tuple[str, int, RunningAggregates]]) -> None:
+        """Insert or replace many partitions in one transaction"""
+        now = datetime.now(timezone.utc).isoformat()
+        with self.con:
+            self.con.executemany(
+                "INSERT OR REPLACE INTO partition_aggregates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(table, side, plan_key, part, fp, f"{digest:016x}", running.rows, now,
+                  pickle.dumps(running, protocol=pickle.HIGHEST_PROTOCOL))
+                 for part, (fp, digest, running) in entries.items()])
+
+    def load_version(self, table: str, side: str, plan_key: str) -> Optional[str]:
+        """Version (file_version) of the source the stored partitions were computed from"""
+        row = self.con.execute("SELECT version FROM source_versions WHERE table_name = ? AND side = ? AND plan_key = ?",
+                               (table, side, plan_key)).fetchone()
+        return row[0] if row else None
+
+    def save_version(self, table: str, side: str, plan_key: str, version: Optional[str]) -> None:
+        """None forgets the version (the partitions came from a source that has none)"""
+        with self.con:
+            if version is None:
+                self.con.execute("DELETE FROM source_versions WHERE table_name = ? AND side = ? AND plan_key = ?",
+                                 (table, side, plan_key))
+            else:
+                self.con.execute("INSERT OR REPLACE INTO source_versions VALUES (?, ?, ?, ?)", (table, side, plan_key, version))
+
+    def drop(self, table: str, side: str, plan_key: str, partitions: Iterable[str]) -> None:
+        with self.con:
+            self.con.executemany(
+                "DELETE FROM partition_aggregates WHERE table_name = ? AND side = ? AND plan_key = ? AND partition = ?",
+                [(table, side, plan_key, part) for part in partitions])
+
+    def close(self) -> None:
+        self.con.close()
+
+
+def plan_key(plan: Dict[Optional[str], List[str]], mapping: Optional[Dict], approx_error: Optional[float]) -> str:
+    """Stored aggregates are only reused for the same rules, mapping and sketch error"""
+    h = hashlib.blake2b(digest_size=12)
+    h.update(repr(sorted((col or "", sorted(aggs)) for col, aggs in plan.items())).encode("utf-8"))
+    h.update(repr(mapping).encode("utf-8"))
+    h.update(repr(approx_error).encode("utf-8"))
+    return h.hexdigest()
+
+
+def file_version(*paths: str) -> str:
+    """Size + modification time of a source's files: unchanged files need not be read again"""
+    stats = [os.stat(path) for path in paths]
+    return "|".join(f"{st.st_size}:{st.st_mtime_ns}" for st in stats)
+
+
+# ---------------------------
+# Partition labels, fingerprints and row digests
+# ---------------------------
+def partition_labels(s: pd.Series) -> pd.Series:
+    """Partition value as text, identical on both sides (202507.0 / 202507 → '202507', dates → 'YYYY-MM-DD')"""
+    #A partition column has few distinct values: only those are formatted, then spread back by code (-1 = NULL)
+    codes, uniques = pd.factorize(s)
+    labels = np.append(_format_labels(pd.Series(uniques)).to_numpy(dtype=object), "NULL")
+    return pd.Series(labels[codes], index=s.index, dtype=object)
+
+
+def _format_labels(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.strftime("%Y-%m-%d").fillna("NULL")
+    if pd.api.types.is_numeric_dtype(s):
+        values = s.astype("Float64")
+        integral = values.notna() & (values % 1 == 0)
+        out = values.astype("string")
+        out[integral] = values[integral].astype("Int64").astype("string")
+        return out.fillna("NULL").astype(object)
+    return s.astype("string").str.strip().fillna("NULL").astype(object)
+
+
+def _grouped_digest(hashes: np.ndarray, labels: pd.Series) -> Dict[str, Tuple[int, int]]:
+    """
+    {label: (rows, sum of the row hashes mod 2**64)} — an order-independent digest of a partition's rows.
+    The uint64 hashes are summed as two 32-bit halves in int64 so nothing overflows.
+    """
+    halves = pd.DataFrame({"hi": (hashes >> np.uint64(32)).astype(np.int64),
+                           "lo": (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64)})
+    grouped = halves.groupby(labels.to_numpy()).agg(["sum", "size"])
+    return {label: (int(row[("hi", "size")]), ((int(row[("hi", "sum")]) << 32) + int(row[("lo", "sum")])) % 2**64)
+            for label, row in grouped.iterrows()}
+
+
+def _combine(digests: Dict[str, Tuple[int, int]], more: Dict[str, Tuple[int, int]]) -> None:
+    for label, (rows, digest) in more.items():
+        old_rows, old_digest = digests.get(label, (0, 0))
+        digests[label] = (old_rows + rows, (old_digest + digest) % 2**64)
+
+
+def _grouped_latest(updated: pd.Series, labels: pd.Series) -> Dict[str, Tuple[int, object]]:
+    """{label: (rows, latest value of the updated_at column)}"""
+    grouped = updated.groupby(labels.to_numpy()).agg(["size", "max"])
+    return {label: (int(row["size"]), None if pd.isna(row["max"]) else row["max"]) for label, row in grouped.iterrows()}
+
+
+def _combine_latest(latest: Dict[str, Tuple[int, object]], more: Dict[str, Tuple[int, object]]) -> None:
+    for label, (rows, value) in more.items():
+        old_rows, old_value = latest.get(label, (0, None))
+        latest[label] = (old_rows + rows, value if old_value is None or (value is not None and value > old_value) else old_value)
+
+
+def _comparable(df: pd.DataFrame, mapping: Optional[Dict], side: str, float_decimals: int = 6) -> pd.DataFrame:
+    """
+    Mapped columns of one (already transformed) side in mapping order, under their target names, normalized
+    the way row_compare.align_frames normalizes them, so an unchanged row gets the same hash on both sides
+    """
+    by_lower = {c.lower(): c for c in df.columns}
+    if mapping is not None:
+        names = [(c["src"] if side == "sas" else c["tgt"], c["tgt"], c.get("transform")) for c in mapping["columns"]]
+    else:
+        names = [(c, c, None) for c in sorted(by_lower)]
+    out = {}
+    for col, name, transform in names:
+        if col.lower() not in by_lower:
+            continue
+        s = df[by_lower[col.lower()]]
+        out[name.lower()] = _normalize_column(s, _column_kind((s,), transform), float_decimals)
+    return pd.DataFrame(out, index=df.index)
+
+
+def _iter_source(source: Source) -> Iterable[pd.DataFrame]:
+    return [source] if isinstance(source, pd.DataFrame) else source()
+
+
+# ---------------------------
+# One side of a table
+# ---------------------------
+def incremental_aggregates(store: PartitionStore, table: str, side: str, source: Source,
+                           plan: Dict[Optional[str], List[str]], mapping: Dict, partition_col: Optional[str] = None,
+                           approx_error: Optional[float] = None,
+                           source_version: Optional[str] = None) -> Tuple[Dict[str, Tuple[int, RunningAggregates]], Dict]:
+    """
+    Running aggregates + row digest per partition of one side ("sas" / "sf") of a table.
+
+    source is an in-memory frame or a zero-argument callable returning a fresh chunk iterator
+    (e.g. lambda: iter_sas_chunks(path)). source_version (file_version of its files) lets an
+    unchanged source be skipped without reading it. Otherwise a first pass fingerprints every
+    partition (hash of its raw rows, plus the latest mapping "updated_at" value when there is one);
+    a second pass, only over the rows of new or changed partitions,
+    computes their aggregates and row digests. Partitions that disappeared are dropped from the store.
+    """
+    def side_column(col: str) -> str:
+        col = col.lower()
+        if side == "sas":
+            return next((c["src"] for c in mapping["columns"] if c["tgt"].lower() == col), col).lower()
+        return col
+
+    src = side_column(partition_col or mapping["partition_by"])
+    updated = side_column(mapping["updated_at"]) if mapping.get("updated_at") else None
+    converters = compile_mapping(mapping)
+    key = plan_key(plan, mapping, approx_error)
+
+    stored = store.load(table, side, key)
+    if stored and source_version is not None and store.load_version(table, side, key) == source_version:
+        #Same files as when the stored partitions were computed
+        partitions = {label: (digest, running) for label, (_, digest, running) in stored.items()}
+        return partitions, {"partitions": len(partitions), "recomputed": [], "reused": len(partitions), "dropped": []}
+
+    def labelled(chunk: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+        chunk = chunk.set_axis(chunk.columns.str.lower(), axis=1)
+        part = normalize_side(chunk[[src]], mapping, side, converters)[src]
+        return chunk, partition_labels(part)
+
+    #Pass 1: content fingerprint of every partition (updated_at only adds to it: an edit that
+    #leaves it untouched still changes the row hashes)
+    content, latest = {}, {}
+    for chunk in _iter_source(source):
+        chunk, labels = labelled(chunk)
+        _combine(content, _grouped_digest(pd.util.hash_pandas_object(chunk, index=False).to_numpy(), labels))
+        if updated is not None:
+            _combine_latest(latest, _grouped_latest(chunk[updated], labels))
+    fingerprints = {label: f"{rows}:{digest:016x}" + (f"@{latest[label][1]}" if updated is not None else "")
+                    for label, (rows, digest) in content.items()}
+
+    changed = {label for label, fp in fingerprints.items() if label not in stored or stored[label][0] != fp}
+
+    #Pass 2: aggregates and row digests of the changed partitions only
+    computed, digests = {}, {}
+    if changed:
+        for chunk in _iter_source(source):
+            chunk, labels = labelled(chunk)
+            mask = labels.isin(changed).to_numpy()
+            if not mask.any():
+                continue
+            chunk, labels = chunk[mask], labels[mask]
+            chunk = normalize_side(chunk, mapping, side, converters)
+            _combine(digests, _grouped_digest(pd.util.hash_pandas_object(_comparable(chunk, mapping, side), index=False).to_numpy(), labels))
+            for label, rows in chunk.groupby(labels.to_numpy(), sort=False):
+                computed.setdefault(label, RunningAggregates(plan, approx_error)).update(rows)
+        store.save(table, side, key, {label: (fingerprints[label], digests[label][1], computed[label]) for label in changed})
+
+    removed = set(stored) - set(fingerprints)
+    if removed:
+        store.drop(table, side, key, removed)
+    store.save_version(table, side, key, source_version)
+
+    partitions = {label: (digests[label][1], computed[label]) if label in changed else (stored[label][1], stored[label][2])
+                  for label in fingerprints}
+    stats = {"partitions": len(fingerprints), "recomputed": sorted(changed), "reused": len(fingerprints) - len(changed),
+             "dropped": sorted(removed)}
+    return partitions, stats
+
+
+# ---------------------------
+# Both sides: table-level results + per-partition comparison
+# ---------------------------
+def merge_partitions(plan: Dict[Optional[str], List[str]], partitions: Dict[str, Tuple[int, RunningAggregates]],
+                     approx_error: Optional[float] = None) -> Dict:
+    """Table-level aggregates from the per-partition ones (sketches and distinct sets merge losslessly)"""
+    total = RunningAggregates(plan, approx_error)
+    for _, running in partitions.values():
+        total.merge(running)
+    return total.result()
+
+
+def partition_digest_result(partition: Dict) -> Dict:
+    """A partition's row-digest comparison as a test result (column = partition label)"""
+    result = {"test_name": "partition_digest", "column": partition["partition"], "status": "PASS",
+              "sas_value": partition["sas_rows"], "sf_value": partition["sf_rows"]}
+    if partition["digest_match"]:
+        result["explanation"] = "Validation passed ✅"
+    else:
+        result["status"] = "FAIL"
+        result["explanation"] = (f"Rows of partition {partition['partition']} differ "
+                                 f"(SAS={partition['sas_rows']} rows vs Snowflake={partition['sf_rows']} rows, row digests differ).")
+    return result
+
+
+def validate_incremental(store: PartitionStore, table: str, tests: List[Dict], sas_source: Source, sf_source: Source,
+                         mapping: Dict, approx_error: Optional[float] = None,
+                         sf_aggs: Optional[Dict] = None, sas_version: Optional[str] = None,
+                         sf_version: Optional[str] = None) -> Dict:
+    """
+    Run a table's tests from persisted per-partition aggregates, recomputing only new or changed partitions.
+    Returns the test results, a per-partition SAS vs Snowflake comparison (rows, row digest) and what was recomputed.
+    Every partition also gets a "partition_digest" result, which fails when its rows differ between the sides.
+    sf_aggs, when given (pushed-down SQL), replace the Snowflake-side aggregates; its partitions are still compared.
+    sas_version / sf_version (file_version of each side's files) skip reading a side whose files are unchanged.
+    """
+    if approx_error:
+        for test in tests:
+            test["approx_error"] = approx_error
+    plan = compile_plan(tests)
+    sas_parts, sas_stats = incremental_aggregates(store, table, "sas", sas_source, plan, mapping, approx_error=approx_error,
+                                                  source_version=sas_version)
+    sf_parts, sf_stats = incremental_aggregates(store, table, "sf", sf_source, plan, mapping, approx_error=approx_error,
+                                                source_version=sf_version)
+
+    sas_aggs = merge_partitions(plan, sas_parts, approx_error)
+    if sf_aggs is None:
+        sf_aggs = merge_partitions(plan, sf_parts, approx_error)
+
+    partitions = []
+    for label in sorted(set(sas_parts) | set(sf_parts)):
+        sas_digest, sas_running = sas_parts.get(label, (None, None))
+        sf_digest, sf_running = sf_parts.get(label, (None, None))
+        partitions.append({
+            "partition": label,
+            "sas_rows": sas_running.rows if sas_running else 0,
+            "sf_rows": sf_running.rows if sf_running else 0,
+            "digest_match": sas_digest is not None and sas_digest == sf_digest,
+            "recomputed": label in sas_stats["recomputed"] or label in sf_stats["recomputed"],
+        })
+
+    results = [run_validation(test, sas_aggs, sf_aggs) for test in tests]
+    results += [partition_digest_result(partition) for partition in partitions]
+    return {
+        "results": results,
+        "partitions": partitions,
+        "incremental": {"sas": sas_stats, "sf": sf_stats},
+    }
@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# ---------------------------
+# Per-stage timing and memory
+# ---------------------------
+#Cheap enough to leave on in production: wall time (perf_counter), CPU time (process_time) and
+#the process peak RSS (getrusage) per stage. Python-level peak allocations per stage
+#(tracemalloc) are opt-in, since tracing slows allocation-heavy code down.
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #Linux reports KiB, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+class StageProfiler:
+    """Collects one record per stage: wall/CPU seconds, rows and rows/s, peak memory"""
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.started = datetime.now(timezone.utc).isoformat()
+        self.stages: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None, **info):
+        """
+        Time the enclosed block. The yielded dict can be filled in from inside the block,
+        e.g. rec["rows"] = len(df) once the row count is known.
+        """
+        rec = {"stage": name, "rows": rows, **info}
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        rss_before = _peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield rec
+        finally:
+            rec["wall_s"] = round(time.perf_counter() - wall, 6)
+            rec["cpu_s"] = round(time.process_time() - cpu, 6)
+            rec["rows_per_sec"] = round(rec["rows"] / rec["wall_s"]) if rec.get("rows") and rec["wall_s"] else None
+            rss_after = _peak_rss_mb()
+            if rss_after is not None:
+                rec["peak_rss_mb"] = round(rss_after, 1)
+                #Growth of the process high-water mark while this stage ran
+                rec["peak_rss_growth_mb"] = round(rss_after - rss_before, 1)
+            if tracemalloc.is_tracing():
+                rec["peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+                if tracing:
+                    tracemalloc.stop()
+            self.stages.append(rec)
+
+    def total(self) -> Dict:
+        return {"wall_s": round(sum(r["wall_s"] for r in self.stages), 6),
+                "cpu_s": round(sum(r["cpu_s"] for r in self.stages), 6)}
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.stages)
+
+    def to_dict(self) -> Dict:
+        return {"started": self.started, "pid": os.getpid(), "total": self.total(), "stages": self.stages}
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), default=str, **kwargs)
+
+
+def stage(perf: Optional[StageProfiler], name: str, rows: Optional[int] = None, **info):
+    """perf.stage(...) when profiling, else a no-op context yielding a throwaway record"""
+    if perf is None:
+        return nullcontext({})
+    return perf.stage(name, rows, **info)
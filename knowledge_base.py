@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional
+
+# ---------------------------
+# Simulated Knowledge Base (Mapping + Validation Templates)
+# ---------------------------
+MAPPINGS = {
+    "customer": {
+        "sas_table": "saslib.customer",
+        "sf_table": "landing.customer",
+        "keys": ["cust_id"],
+        "columns": [
+            {"src": "cust_id", "tgt": "cust_id", "transform": "CAST"},
+            {"src": "first_name", "tgt": "first_name"},
+            {"src": "last_name", "tgt": "last_name"},
+            {"src": "email", "tgt": "email", "pii": True, "masking": "hash_email"},
+            {"src": "birth_dt", "tgt": "birth_dt", "transform": "SAS_DATE_TO_DATE"},
+            {"src": "is_active", "tgt": "is_active", "transform": "0/1 to BOOLEAN"},
+        ],
+    },
+    "transaction": {
+        "sas_table": "saslib.transaction",
+        "sf_table": "landing.transaction",
+        "keys": ["tran_id"],
+        "columns": [
+            {"src": "tran_id", "tgt": "tran_id"},
+            {"src": "cust_id", "tgt": "cust_id"},
+            {"src": "tran_dt", "tgt": "tran_dt", "transform": "SAS_DATETIME_TO_TIMESTAMP"},
+            {"src": "amount", "tgt": "amount", "dtype": "float64"},
+            {"src": "currency", "tgt": "currency", "dtype": "string"},
+            {"src": "product_id", "tgt": "product_id"},
+        ],
+    },
+    #Tables that grow by partition: "partition_by" drives the incremental (per-partition) validation,
+    #"updated_at" (optional) names a column whose latest value changes whenever a partition's rows do
+    "daily_balance": {
+        "sas_table": "saslib.daily_balance",
+        "sf_table": "reporting.daily_balance",
+        "keys": ["customer_id", "account_id", "date"],
+        "partition_by": "date",
+        "columns": [
+            {"src": "customer_id", "tgt": "customer_id", "transform": "CAST"},
+            {"src": "account_id", "tgt": "account_id", "dtype": "string"},
+            {"src": "date", "tgt": "date", "transform": "SAS_DATE_TO_DATE"},
+            {"src": "end_of_day_balance", "tgt": "end_of_day_balance", "dtype": "float64"},
+        ],
+    },
+    "monthly_amb": {
+        "sas_table": "saslib.monthly_amb",
+        "sf_table": "reporting.monthly_amb",
+        "keys": ["customer_id", "account_id", "reporting_month_yyyymm"],
+        "partition_by": "reporting_month_yyyymm",
+        #Recomputed months get a new date_computed: incremental runs fingerprint partitions by it
+        "updated_at": "date_computed",
+        "columns": [
+            {"src": "customer_id", "tgt": "customer_id", "transform": "CAST"},
+            {"src": "account_id", "tgt": "account_id", "dtype": "string"},
+            {"src": "reporting_month_yyyymm", "tgt": "reporting_month_yyyymm", "transform": "CAST"},
+            {"src": "average_monthly_balance", "tgt": "average_monthly_balance", "dtype": "float64"},
+            {"src": "date_computed", "tgt": "date_computed", "transform": "SAS_DATE_TO_DATE"},
+        ],
+    },
+}
+
+#column: the mapped (target) column a template needs; sql is formatted with the Snowflake table name
+VALIDATION_TEMPLATES = [
+    {"name": "row_count", "desc": "Row counts should match",
+     "column": None, "sql": "SELECT COUNT(*) FROM {table}", "tolerance": 0},
+    {"name": "sum_amount", "desc": "SUM(amount) should match within tolerance",
+     "column": "amount", "sql": "SELECT SUM(amount) FROM {table}", "tolerance": 0.001},
+    {"name": "distinct_cust", "desc": "Distinct customers should match",
+     "column": "cust_id", "sql": "SELECT COUNT(DISTINCT cust_id) FROM {table}", "tolerance": 0},
+    {"name": "null_email", "desc": "No null emails allowed",
+     "column": "email", "sql": "SELECT COUNT(*) FROM {table} WHERE email IS NULL", "tolerance": 0},
+]
+
+# ---------------------------
+# Helper functions
+# ---------------------------
+def template_test(template: Dict, table: str) -> Optional[Dict]:
+    """A template as a test of one table, or None if the table's mapping lacks the column it needs"""
+    mapping = MAPPINGS.get(table)
+    if mapping is None:
+        return None
+    if template["column"] is not None and template["column"] not in {c["tgt"] for c in mapping["columns"]}:
+        return None
+    return {"name": template["name"], "sql": template["sql"].format(table=mapping["sf_table"]),
+            "tolerance": template["tolerance"]}
+
+
+def generate_validation_tests(table: str) -> List[Dict]:
+    """
+    Simulate LLM generating tests from templates + mappings.
+    Every template the table's mapping can support is added to the table's own tests, so the
+    apps and batch_validate run the same rules on a table.
+    """
+    tests = []
+    if table == "customer":
+        tests.append({"name": "row_count", "sql": "SELECT COUNT(*) FROM landing.customer", "tolerance": 0})
+        tests.append({"name": "null_email", "sql": "SELECT COUNT(*) FROM landing.customer WHERE email IS NULL", "tolerance": 0})
+    if table == "transaction":
+        tests.append({"name": "row_count", "sql": "SELECT COUNT(*) FROM landing.transaction", "tolerance": 0})
+        tests.append({"name": "sum_amount", "sql": "SELECT SUM(amount) FROM landing.transaction", "tolerance": 0.001})
+        tests.append({"name": "distinct_cust", "sql": "SELECT COUNT(DISTINCT cust_id) FROM landing.transaction", "tolerance": 0})
+    if table == "daily_balance":
+        tests.append({"name": "row_count", "sql": "SELECT COUNT(*) FROM reporting.daily_balance", "tolerance": 0})
+    if table == "monthly_amb":
+        tests.append({"name": "row_count", "sql": "SELECT COUNT(*) FROM reporting.monthly_amb", "tolerance": 0})
+
+    names = {test["name"] for test in tests}
+    for template in VALIDATION_TEMPLATES:
+        test = template_test(template, table)
+        if test is not None and test["name"] not in names:
+            tests.append(test)
+            names.add(test["name"])
+    return tests
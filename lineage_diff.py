@@ -0,0 +1,176 @@
+import argparse
+import hashlib
+import json
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from lineage_graph import split_names, table_key
+from lineage_reader import CompactLineage, read_lineage
+
+# ---------------------------
+# Structural diff of two lineage exports
+# ---------------------------
+#Both sides are reduced to table → table edges on canonical names (table_key, plus optional
+#aliases), so SAS, Snowflake and SAS DI exports line up: WORK.CUST_ACCOUNTS, STG.CUST_ACCOUNTS
+#and CUST_ACCOUNTS.sas7bdat are one table. Every target table gets a hash of its inputs (source
+#tables and their source_code highlights); only targets whose hashes differ are compared edge by
+#edge, so two large exports that mostly agree are diffed in one pass over their edges.
+
+#Execution
+#python lineage_diff.py sas_lineage.json snowflake_lineage.json
+#python lineage_diff.py collibra_lineage.json sf_lineage.json --alias amb_monthly=monthly_amb --no-highlights
+
+
+def _highlights(code: Dict) -> Tuple:
+    return tuple(sorted((h.get("start"), h.get("len"), h.get("text")) for h in code.get("highlights") or []))
+
+
+def lineage_links(lineage) -> Iterable[Tuple[str, str, Optional[str], Tuple]]:
+    """
+    (source, target, job, highlights) per edge of a lineage export: a Collibra-style list of
+    links, the {"nodes": [{"id"}], "edges": [{"from", "to"}]} JSON of SAS_DIS_Lineage_Generator.sas
+    (which has no jobs or highlights), or a CompactLineage streamed from either.
+    """
+    if isinstance(lineage, CompactLineage):
+        yield from lineage.links()
+        return
+    if isinstance(lineage, dict):
+        for edge in lineage.get("edges", []):
+            yield edge["from"].strip(), edge["to"].strip(), None, ()
+        return
+    for link in lineage:
+        code = link.get("source_code") or {}
+        job = code.get("transformation_display_name") or code.get("path")
+        highlights = _highlights(code)
+        target = link["trg"]["parent"]["name"].strip()
+        for source in split_names(link["src"]["parent"]["name"]):
+            yield source, target, job, highlights
+
+
+def lineage_nodes(lineage) -> Iterable[str]:
+    """Table names of an export, including SAS DI nodes without edges"""
+    if isinstance(lineage, CompactLineage):
+        yield from lineage.table_names()
+        return
+    if isinstance(lineage, dict):
+        for node in lineage.get("nodes", []):
+            yield node["id"].strip()
+    for source, target, _, _ in lineage_links(lineage):
+        yield source
+        yield target
+
+
+class CanonicalLineage:
+    """Table-level lineage on canonical names, remembering which raw names map to each"""
+
+    def __init__(self, lineage, aliases: Optional[Dict[str, str]] = None):
+        aliases = {table_key(k): table_key(v) for k, v in (aliases or {}).items()}
+        self._memo: Dict[str, str] = {}
+        #Canonical name → raw names, canonical target → {canonical source: highlights}
+        self.raw: Dict[str, Set[str]] = defaultdict(set)
+        self.inputs: Dict[str, Dict[str, Set[Tuple]]] = defaultdict(dict)
+
+        def canon(name):
+            key = self._memo.get(name)
+            if key is None:
+                key = self._memo[name] = aliases.get(table_key(name), table_key(name))
+                self.raw[key].add(name)
+            return key
+
+        for name in lineage_nodes(lineage) if isinstance(lineage, (dict, CompactLineage)) else ():
+            canon(name)
+        for source, target, _, highlights in lineage_links(lineage):
+            sources = self.inputs[canon(target)]
+            sources.setdefault(canon(source), set()).update(highlights)
+
+    @property
+    def tables(self) -> Set[str]:
+        return set(self.raw)
+
+    def signature(self, target: str, highlights: bool) -> bytes:
+        """Hash of a target's inputs: equal signatures mean no edge or highlight difference"""
+        h = hashlib.blake2b(digest_size=16)
+        for source, marks in sorted(self.inputs.get(target, {}).items()):
+            h.update(source.encode("utf-8") + b"\0")
+            if highlights:
+                h.update(repr(sorted(marks, key=repr)).encode("utf-8") + b"\0")
+        return h.digest()
+
+
+def diff_lineage(left, right, aliases: Optional[Dict[str, str]] = None, highlights: bool = True) -> Dict:
+    """
+    Differences of right against left (e.g. SAS vs Snowflake, or yesterday's vs today's export):
+    - missing_tables / extra_tables: tables only on the left / right
+    - missing_edges / extra_edges: source → target edges only on the left / right
+    - rewired: targets present on both sides that are built from different source tables
+    - changed_highlights: edges on both sides whose source_code highlights differ (highlights=True)
+    - error_tables: raw node names of every table involved, per side, for LineageGraph highlighting
+    """
+    if not isinstance(left, CanonicalLineage):
+        left = CanonicalLineage(left, aliases)
+    if not isinstance(right, CanonicalLineage):
+        right = CanonicalLineage(right, aliases)
+
+    report = {"missing_tables": sorted(left.tables - right.tables), "extra_tables": sorted(right.tables - left.tables),
+              "missing_edges": [], "extra_edges": [], "rewired": [], "changed_highlights": []}
+    flagged = set(report["missing_tables"]) | set(report["extra_tables"])
+    for target in sorted(set(left.inputs) | set(right.inputs)):
+        if left.signature(target, highlights) == right.signature(target, highlights):
+            continue
+        left_inputs, right_inputs = left.inputs.get(target, {}), right.inputs.get(target, {})
+        missing = sorted(set(left_inputs) - set(right_inputs))
+        extra = sorted(set(right_inputs) - set(left_inputs))
+        report["missing_edges"] += [[source, target] for source in missing]
+        report["extra_edges"] += [[source, target] for source in extra]
+        if left_inputs and right_inputs and (missing or extra):
+            report["rewired"].append({"target": target, "left_sources": sorted(left_inputs), "right_sources": sorted(right_inputs)})
+        changed = []
+        if highlights:
+            changed = [{"source": source, "target": target, "left": sorted(left_inputs[source], key=repr),
+                        "right": sorted(right_inputs[source], key=repr)}
+                       for source in sorted(set(left_inputs) & set(right_inputs))
+                       if left_inputs[source] != right_inputs[source]]
+            report["changed_highlights"] += changed
+        if missing or extra or changed:
+            flagged.add(target)
+            flagged.update(missing + extra)
+
+    report["flagged_tables"] = sorted(flagged)
+    report["error_tables"] = {"left": sorted(n for t in flagged for n in left.raw.get(t, ())),
+                              "right": sorted(n for t in flagged for n in right.raw.get(t, ()))}
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Diff two lineage exports (Collibra-style JSON or SAS DI nodes/edges JSON)")
+    parser.add_argument("left", help="Reference lineage JSON (e.g. SAS)")
+    parser.add_argument("right", help="Lineage JSON compared against it (e.g. Snowflake)")
+    parser.add_argument("--alias", action="append", default=[], metavar="NAME=CANONICAL",
+                        help="Treat table NAME as CANONICAL (repeatable), for tables renamed in the migration")
+    parser.add_argument("--no-highlights", action="store_true", help="Compare edges only, not source_code highlights")
+    parser.add_argument("--output", default="-", help="Diff JSON file ('-' = stdout)")
+    args = parser.parse_args(argv)
+    aliases = {}
+    for alias in args.alias:
+        name, sep, canonical = alias.partition("=")
+        if not sep:
+            parser.error(f"--alias expects NAME=CANONICAL, got {alias!r}")
+        aliases[name] = canonical
+
+    #Streamed into compact tables, so large exports are never loaded whole
+    report = diff_lineage(read_lineage(args.left), read_lineage(args.right), aliases, highlights=not args.no_highlights)
+    payload = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    print(f"{len(report['missing_edges'])} missing, {len(report['extra_edges'])} extra edges, "
+          f"{len(report['rewired'])} rewired targets, {len(report['changed_highlights'])} changed highlights",
+          file=sys.stderr)
+    return 0 if not report["flagged_tables"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from pyvis.network import Network
+except ImportError:
+    Network = None
+
+# ---------------------------
+# Indexed lineage graph
+# ---------------------------
+#Nodes (tables and jobs) are interned to dense integer ids; successors and predecessors are
+#kept as adjacency lists next to an edge set, so duplicate links are dropped on insert and
+#upstream/downstream walks only touch the edges they follow.
+NODE_COLORS = {"table": "skyblue", "target": "lightgreen", "job": "orange"}
+
+
+#Extract files that stand for the table of the same name
+FILE_SUFFIXES = (".sas7bdat", ".xpt", ".csv", ".parquet")
+
+
+def table_key(name: str) -> str:
+    """
+    System-neutral key of a lineage table name: file suffixes and library/database/schema
+    qualifiers are dropped, so WORK.MONTHLY_AMB, STG.MONTHLY_AMB and MONTHLY_AMB.sas7bdat → monthly_amb
+    """
+    name = name.strip().lower()
+    for suffix in FILE_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+            break
+    return name.rsplit(".", 1)[-1]
+
+
+def split_names(name: str) -> List[str]:
+    """Collibra parents grouping several inputs of one job ("WORK.A + WORK.B") as separate names"""
+    return [part.strip() for part in name.split(" + ") if part.strip()]
+
+
+class LineageGraph:
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.kinds: List[str] = []
+        self.succ: List[List[int]] = []
+        self.pred: List[List[int]] = []
+        self._edges: Set[Tuple[int, int]] = set()
+        #Source code of the job behind each job node (path, highlights), from the lineage JSON
+        self.jobs: Dict[int, Dict] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._edges)
+
+    def intern(self, name: str, kind: str = "table") -> int:
+        """Id of a node, created on first use"""
+        node = self._ids.get(name)
+        if node is None:
+            node = self._ids[name] = len(self.names)
+            self.names.append(name)
+            self.kinds.append(kind)
+            self.succ.append([])
+            self.pred.append([])
+        return node
+
+    def node_id(self, name: str) -> Optional[int]:
+        return self._ids.get(name)
+
+    def add_edge(self, src: str, dst: str, src_kind: str = "table", dst_kind: str = "table") -> bool:
+        """Add src → dst unless it already exists; True when the edge is new"""
+        u, v = self.intern(src, src_kind), self.intern(dst, dst_kind)
+        if (u, v) in self._edges:
+            return False
+        self._edges.add((u, v))
+        self.succ[u].append(v)
+        self.pred[v].append(u)
+        return True
+
+    def edges(self) -> List[Tuple[str, str]]:
+        return [(self.names[u], self.names[v]) for u, v in self._edges]
+
+    @classmethod
+    def from_collibra(cls, lineage_json: Iterable[Dict]) -> "LineageGraph":
+        """
+        Collibra-style links ({"src": {"parent"}, "trg": {"parent"}, "source_code"}) as
+        source table(s) → job → target table paths; a job shared by several links is one node.
+        """
+        graph = cls()
+        for link in lineage_json:
+            src_tables = split_names(link["src"]["parent"]["name"])
+            trg_table = link["trg"]["parent"]["name"]
+            code = link.get("source_code") or {}
+            job = code.get("transformation_display_name") or code.get("path") or f"{' + '.join(src_tables)} → {trg_table}"
+            for src_table in src_tables:
+                graph.add_edge(src_table, job, "table", "job")
+            graph.add_edge(job, trg_table, "job", "table")
+            graph.jobs.setdefault(graph.node_id(job), {"path": code.get("path"), "highlights": code.get("highlights", [])})
+        return graph
+
+    # ---------------------------
+    # Impact queries
+    # ---------------------------
+    def _walk(self, starts: Iterable[str], adjacency: List[List[int]], include_jobs: bool) -> List[str]:
+        """Breadth-first reach from the start nodes (excluded), visiting each edge at most once"""
+        seen = set()
+        queue = deque()
+        for name in starts:
+            node = self._ids.get(name)
+            if node is not None and node not in seen:
+                seen.add(node)
+                queue.append(node)
+        start_ids = set(seen)
+        order = []
+        while queue:
+            for nxt in adjacency[queue.popleft()]:
+                if nxt not in seen:
+                    seen.add(nxt)
+                    queue.append(nxt)
+                    order.append(nxt)
+        return [self.names[n] for n in order if n not in start_ids and (include_jobs or self.kinds[n] != "job")]
+
+    def downstream(self, names: Iterable[str], include_jobs: bool = False) -> List[str]:
+        """Everything fed (directly or not) by the given nodes, nearest first"""
+        return self._walk([names] if isinstance(names, str) else names, self.succ, include_jobs)
+
+    def upstream(self, names: Iterable[str], include_jobs: bool = False) -> List[str]:
+        """Everything the given nodes are built from, nearest first"""
+        return self._walk([names] if isinstance(names, str) else names, self.pred, include_jobs)
+
+    def sources(self) -> List[str]:
+        return [self.names[n] for n in range(len(self)) if not self.pred[n]]
+
+    def sinks(self) -> List[str]:
+        return [self.names[n] for n in range(len(self)) if not self.succ[n]]
+
+    # ---------------------------
+    # Rendering
+    # ---------------------------
+    def content_hash(self, error_tables: Iterable[str] = ()) -> str:
+        """Hash of the nodes, edges and highlighted tables: equal hashes render identical HTML"""
+        h = hashlib.blake2b(digest_size=16)
+        for name, kind in sorted(zip(self.names, self.kinds)):
+            h.update(f"n\0{kind}\0{name}\0".encode("utf-8"))
+        for src, dst in sorted(self.edges()):
+            h.update(f"e\0{src}\0{dst}\0".encode("utf-8"))
+        for name in sorted(set(error_tables)):
+            h.update(f"x\0{name}\0".encode("utf-8"))
+        return h.hexdigest()
+
+    def to_pyvis(self, error_tables: Iterable[str] = (), height: str = "300px"):
+        """PyVis network; nodes in error_tables and job → table edges touching them are drawn red"""
+        if Network is None:
+            raise ImportError("pyvis is required to render lineage graphs (pip install pyvis)")
+        error_tables = set(error_tables)
+        net = Network(height=height, width="100%", notebook=False, directed=True)
+        for node, name in enumerate(self.names):
+            kind = self.kinds[node]
+            default = NODE_COLORS["job" if kind == "job" else ("target" if self.pred[node] else "table")]
+            net.add_node(name, label=name, color="red" if name in error_tables else default,
+                         shape="dot", font={"vadjust": -20})  # label above the node
+        for u, v in self._edges:
+            src, dst = self.names[u], self.names[v]
+            if self.kinds[u] == "job" and (src in error_tables or dst in error_tables):
+                net.add_edge(src, dst, color="red")
+            else:
+                net.add_edge(src, dst)
+        return net
+
+    def render_html(self, error_tables: Iterable[str] = (), height: str = "300px") -> str:
+        net = self.to_pyvis(error_tables, height)
+        if hasattr(net, "generate_html"):
+            return net.generate_html()
+        #Older pyvis can only write files: write once, read back, and remove the file
+        fd, path = tempfile.mkstemp(suffix=".html")
+        os.close(fd)
+        try:
+            net.write_html(path, open_browser=False)
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+
+_HTML_CACHE: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+HTML_CACHE_SIZE = 32
+
+
+def cached_html(graph: LineageGraph, error_tables: Iterable[str] = (), height: str = "300px") -> str:
+    """Rendered HTML of a graph, reused for as long as its content (and highlights) are unchanged"""
+    key = (graph.content_hash(error_tables), height)
+    html = _HTML_CACHE.get(key)
+    if html is None:
+        html = _HTML_CACHE[key] = graph.render_html(error_tables, height)
+        while len(_HTML_CACHE) > HTML_CACHE_SIZE:
+            _HTML_CACHE.popitem(last=False)
+    else:
+        _HTML_CACHE.move_to_end(key)
+    return html
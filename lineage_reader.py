@@ -0,0 +1,230 @@
+import json
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from lineage_graph import LineageGraph, split_names
+
+# ---------------------------
+# Streaming reader for large lineage exports
+# ---------------------------
+#Metadata-server exports repeat the same System/Database/Schema node dicts on every link and can
+#be hundreds of MB. The reader decodes one array element at a time from a buffered file (never the
+#whole document) and interns names, node paths and source code into integer-id tables, so memory
+#follows the number of unique assets and jobs, not the file size. Links are kept as int columns.
+READ_SIZE = 1 << 20
+_WHITESPACE = " \t\n\r"
+
+
+class _Buffer:
+    """Text buffer over a file that refills on demand; consumed text is dropped as it goes"""
+
+    def __init__(self, f, read_size: int = READ_SIZE):
+        self.f = f
+        self.read_size = read_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of file), without consuming it"""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return self.text[self.pos:self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed lineage JSON: expected {char!r}, found {found!r}")
+        self.pos += 1
+
+    def value(self, decoder: json.JSONDecoder):
+        """Decode the next JSON value, reading more of the file while it is incomplete"""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            #A number can be cut off at the end of the buffer and still decode
+            if end == len(self.text) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_items(f, keys: Iterable[str] = ("nodes", "edges"),
+                    read_size: int = READ_SIZE) -> Iterator[Tuple[Optional[str], object]]:
+    """
+    Stream the elements of a JSON document without loading it: (None, item) per element of a
+    top-level array (Collibra export), or (key, item) per element of the array under each of keys
+    of a top-level object (SAS DI nodes/edges export); other values of the object are skipped.
+    """
+    keys = set(keys)
+    buf = _Buffer(f, read_size)
+    decoder = json.JSONDecoder()
+
+    def array_items(key):
+        buf.expect("[")
+        if buf.peek() == "]":
+            buf.pos += 1
+            return
+        while True:
+            yield key, buf.value(decoder)
+            if buf.peek() == ",":
+                buf.pos += 1
+            else:
+                buf.expect("]")
+                return
+
+    first = buf.peek()
+    if first == "[":
+        yield from array_items(None)
+    elif first == "{":
+        buf.pos += 1
+        while buf.peek() != "}":
+            key = buf.value(decoder)
+            buf.expect(":")
+            if key in keys and buf.peek() == "[":
+                yield from array_items(key)
+            else:
+                buf.value(decoder)
+            if buf.peek() == ",":
+                buf.pos += 1
+        buf.pos += 1
+    else:
+        raise ValueError(f"Malformed lineage JSON: expected an array or object, found {first!r}")
+
+
+class StringTable:
+    """Interned values ↔ dense integer ids"""
+
+    def __init__(self):
+        self._ids: Dict[object, int] = {}
+        self.values: List = []
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, value_id: int):
+        return self.values[value_id]
+
+    def intern(self, value) -> int:
+        value_id = self._ids.get(value)
+        if value_id is None:
+            value_id = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+
+class CompactLineage:
+    """
+    Lineage links as integer columns over interned tables:
+    names (table, job and node names), paths (System/Database/Schema chains as tuples of
+    (name id, type id)), assets ((path id, name id) of each table) and code
+    ((path, highlights) of each job's source code).
+    """
+
+    def __init__(self):
+        self.names = StringTable()
+        self.types = StringTable()
+        self.paths = StringTable()
+        self.assets = StringTable()
+        self.code = StringTable()
+        self.src = array("l")
+        self.trg = array("l")
+        self.job = array("l")
+        self.code_id = array("l")
+
+    def __len__(self) -> int:
+        return len(self.src)
+
+    def _path(self, nodes: List[Dict]) -> int:
+        return self.paths.intern(tuple((self.names.intern(n.get("name")), self.types.intern(n.get("type"))) for n in nodes or []))
+
+    def add_table(self, name: str, path_id: int = -1) -> int:
+        """Asset id of a table (a name under a node path; -1 = no path, as in SAS DI exports)"""
+        return self.assets.intern((path_id, self.names.intern(name.strip())))
+
+    def add_link(self, link: Dict) -> None:
+        """One Collibra-style link; grouped sources ("WORK.A + WORK.B") become one link per source"""
+        trg = self.add_table(link["trg"]["parent"]["name"], self._path(link["trg"].get("nodes")))
+        src_path = self._path(link["src"].get("nodes"))
+        code = link.get("source_code") or {}
+        job_name = code.get("transformation_display_name") or code.get("path")
+        job = self.names.intern(job_name) if job_name else -1
+        highlights = tuple(sorted((h.get("start"), h.get("len"), h.get("text")) for h in code.get("highlights") or []))
+        code_id = self.code.intern((code.get("path"), highlights)) if code else -1
+        for name in split_names(link["src"]["parent"]["name"]):
+            self.src.append(self.add_table(name, src_path))
+            self.trg.append(trg)
+            self.job.append(job)
+            self.code_id.append(code_id)
+
+    def add_edge(self, source: str, target: str) -> None:
+        """One table → table edge of a SAS DI export (no path, job or source code)"""
+        self.src.append(self.add_table(source, -1))
+        self.trg.append(self.add_table(target, -1))
+        self.job.append(-1)
+        self.code_id.append(-1)
+
+    def asset_name(self, asset_id: int) -> str:
+        return self.names[self.assets[asset_id][1]]
+
+    def links(self) -> Iterator[Tuple[str, str, Optional[str], Tuple]]:
+        """(source, target, job, highlights) per link, as lineage_diff.lineage_links yields them"""
+        for src, trg, job, code_id in zip(self.src, self.trg, self.job, self.code_id):
+            yield (self.asset_name(src), self.asset_name(trg), self.names[job] if job >= 0 else None,
+                   self.code[code_id][1] if code_id >= 0 else ())
+
+    def table_names(self) -> Iterator[str]:
+        for _, name_id in self.assets.values:
+            yield self.names[name_id]
+
+    def to_graph(self) -> LineageGraph:
+        """Indexed graph (same shape as LineageGraph.from_collibra; SAS DI edges link tables directly)"""
+        graph = LineageGraph()
+        for _, name_id in self.assets.values:
+            graph.intern(self.names[name_id])
+        for src, trg, job, code_id in zip(self.src, self.trg, self.job, self.code_id):
+            src_name, trg_name = self.asset_name(src), self.asset_name(trg)
+            if job < 0:
+                graph.add_edge(src_name, trg_name)
+                continue
+            job_name = self.names[job]
+            graph.add_edge(src_name, job_name, "table", "job")
+            graph.add_edge(job_name, trg_name, "job", "table")
+            if code_id >= 0:
+                path, highlights = self.code[code_id]
+                graph.jobs.setdefault(graph.node_id(job_name), {"path": path, "highlights": [
+                    {k: v for k, v in zip(("start", "len", "text"), h) if v is not None} for h in highlights]})
+        return graph
+
+
+def read_lineage(path: str, read_size: int = READ_SIZE) -> CompactLineage:
+    """Stream a Collibra-style or SAS DI lineage JSON file into a CompactLineage"""
+    lineage = CompactLineage()
+    with open(path, "r", encoding="utf-8") as f:
+        for key, item in iter_json_items(f, read_size=read_size):
+            if key is None:
+                lineage.add_link(item)
+            elif key == "edges":
+                lineage.add_edge(item["from"], item["to"])
+            else:
+                lineage.add_table(item["id"])
+    return lineage
+
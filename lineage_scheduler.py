@@ -0,0 +1,152 @@
+import heapq
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from lineage_graph import LineageGraph, table_key
+
+# ---------------------------
+# Lineage-driven validation order
+# ---------------------------
+#Tables are validated in topological order of the lineage: a table starts as soon as everything
+#it is built from has been validated, so independent branches run side by side and a full
+#pipeline takes about as long as its critical path. Once an upstream table fails, the tables
+#downstream of it are skipped (their differences would mostly be inherited) or, with
+#on_upstream_failure="deprioritize", still validated but only after every healthy table.
+UPSTREAM_FAILURE_MODES = ("skip", "deprioritize")
+
+
+def table_dependencies(graph: LineageGraph, tables: Iterable[str]) -> Dict[str, Set[str]]:
+    """
+    Nearest upstream tables (among tables) of every table. Lineage nodes are matched to tables
+    with table_key, so RAW/WORK/STG copies of a table are one table; jobs and tables that are
+    not being validated are walked through.
+    """
+    tables = set(tables)
+    nodes_of: Dict[str, List[int]] = {t: [] for t in tables}
+    for node, name in enumerate(graph.names):
+        if graph.kinds[node] != "job" and table_key(name) in tables:
+            nodes_of[table_key(name)].append(node)
+
+    deps = {}
+    for table, nodes in nodes_of.items():
+        seen = set(nodes)
+        stack = list(nodes)
+        found = set()
+        while stack:
+            for prev in graph.pred[stack.pop()]:
+                if prev in seen:
+                    continue
+                seen.add(prev)
+                key = table_key(graph.names[prev]) if graph.kinds[prev] != "job" else None
+                if key in tables and key != table:
+                    #Stop at the nearest validated table; what feeds it is its own dependency
+                    found.add(key)
+                else:
+                    stack.append(prev)
+        deps[table] = found
+    return deps
+
+
+def _critical_path(deps: Dict[str, Set[str]]) -> Dict[str, int]:
+    """Length of the longest chain of tables downstream of (and including) each table"""
+    children = {t: [] for t in deps}
+    for table, parents in deps.items():
+        for parent in parents:
+            children[parent].append(table)
+    #Topological order (Kahn), then longest paths from the most downstream tables back up:
+    #linear in tables + edges and free of recursion, whatever the depth of the lineage
+    waiting = {t: len(parents) for t, parents in deps.items()}
+    order = [t for t, n in waiting.items() if n == 0]
+    for table in order:
+        for child in children[table]:
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                order.append(child)
+    if len(order) < len(deps):
+        cycle = sorted(t for t, n in waiting.items() if n > 0)
+        raise ValueError(f"Lineage has a cycle; tables on or downstream of it: {', '.join(cycle)}")
+    length = {}
+    for table in reversed(order):
+        length[table] = 1 + max((length[c] for c in children[table]), default=0)
+    return length
+
+
+def run_scheduled(deps: Dict[str, Set[str]], submit: Callable[[str], Future], max_in_flight: int,
+                  failed: Callable[[Dict], bool], on_upstream_failure: str = "skip",
+                  on_result: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Dict]:
+    """
+    Validate the tables of deps (table → upstream tables) in topological order.
+    submit(table) starts a validation and returns its future; at most max_in_flight run at once,
+    so the order below (not the executor's FIFO queue) decides what runs next: healthy tables
+    first, then by longest chain of tables still waiting on them.
+    failed(result) tells whether a finished table counts as failed for its downstream tables.
+    Skipped tables get {"table", "skipped", "results": []}; results of tables validated after an
+    upstream failure carry "upstream_failed".
+    """
+    if on_upstream_failure not in UPSTREAM_FAILURE_MODES:
+        raise ValueError(f"on_upstream_failure must be one of {UPSTREAM_FAILURE_MODES}")
+    priority = _critical_path(deps)
+    children = {t: [] for t in deps}
+    for table, parents in deps.items():
+        for parent in parents:
+            children[parent].append(table)
+    waiting = {t: len(parents) for t, parents in deps.items()}
+    failed_upstream: Dict[str, Set[str]] = {t: set() for t in deps}
+    order = {t: i for i, t in enumerate(deps)}
+    ready = []
+    results: Dict[str, Dict] = {}
+
+    def push(table):
+        heapq.heappush(ready, (bool(failed_upstream[table]), -priority[table], order[table], table))
+
+    def finish(table, result, is_failed):
+        results[table] = result
+        if on_result is not None:
+            on_result(table, result)
+        for child in children[table]:
+            if is_failed:
+                failed_upstream[child].add(table)
+                if "skipped" in result:
+                    #Carried through skipped tables, so the table that actually failed is reported
+                    failed_upstream[child] |= failed_upstream[table]
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                push(child)
+
+    for table in deps:
+        if waiting[table] == 0:
+            push(table)
+    running: Dict[Future, str] = {}
+    while ready or running:
+        while ready and len(running) < max_in_flight:
+            _, _, _, table = heapq.heappop(ready)
+            upstream = sorted(failed_upstream[table])
+            if upstream and on_upstream_failure == "skip":
+                roots = sorted(u for u in upstream if "skipped" not in results[u])
+                finish(table, {"table": table, "skipped": f"Upstream failed: {', '.join(roots)}", "results": []}, True)
+                continue
+            running[submit(table)] = table
+        if not running:
+            continue
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            table = running.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"table": table, "error": f"{type(e).__name__}: {e}", "results": []}
+            if failed_upstream[table]:
+                result["upstream_failed"] = sorted(failed_upstream[table])
+            finish(table, result, failed(result))
+    return results
+
+
+def table_failed(result: Dict) -> bool:
+    """A table fails when it could not be validated or any of its tests failed"""
+    return "error" in result or "skipped" in result or any(r["status"] != "PASS" for r in result["results"])
+
+
+def error_nodes(graph: LineageGraph, results: Dict[str, Dict]) -> List[str]:
+    """Lineage node names of the failed tables, for LineageGraph error_tables highlighting"""
+    failed = {t for t, r in results.items() if "skipped" not in r and table_failed(r)}
+    return [name for node, name in enumerate(graph.names) if graph.kinds[node] != "job" and table_key(name) in failed]
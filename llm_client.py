@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+# ---------------------------
+# Model invocation layer
+# ---------------------------
+#Every Streamlit rerun and every failed test would otherwise be a model call. Responses are cached
+#by (task, normalized prompt, context hash) with a TTL and an LRU bound, identical requests already
+#in flight wait for the first one instead of calling the model again, and failure explanations
+#are sent as one batched call for all the failures that are not cached yet.
+DEFAULT_CACHE_ENTRIES = int(os.environ.get("LLM_CACHE_ENTRIES", "1024"))
+DEFAULT_TTL_S = float(os.environ.get("LLM_CACHE_TTL_S", "3600"))
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Prompts differing only in whitespace share a cache entry"""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+def context_hash(context) -> str:
+    """Stable hash of the (JSON-like) context sent along with a prompt"""
+    return hashlib.blake2b(json.dumps(context, sort_keys=True, default=str).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def request_key(task: str, prompt: str, context=None) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    for part in (task, normalize_prompt(prompt), context_hash(context)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """LRU cache of model responses; entries expire ttl_s seconds after they were stored"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES, ttl_s: float = DEFAULT_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()  # key -> (expires at, response)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+# ---------------------------
+# Backends
+# ---------------------------
+#A backend answers complete(task, prompt, context) -> str. The prompt is what a hosted model
+#would get; the context carries the same information structured, for local backends.
+class StubBackend:
+    """Deterministic local backend: same request, same answer, no network and no tokens"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def complete(self, task: str, prompt: str, context=None) -> str:
+        self.calls += 1
+        if task == "suggest_columns":
+            return json.dumps(_stub_columns(context["rule"], context["numeric"], context["string"], context["columns"]))
+        if task == "explain_failures":
+            return json.dumps([_stub_explanation(f) for f in context["failures"]])
+        raise ValueError(f"StubBackend has no answer for task {task!r}")
+
+
+def _stub_columns(rule: str, numeric: List[str], string: List[str], columns: List[str]) -> List[str]:
+    if rule == "sum_amount":
+        return numeric[:3]  # top 3 numeric candidates
+    if rule == "distinct_count":
+        return string[:3]   # top 3 categorical candidates
+    if rule == "not_null":
+        return columns[:5]  # first 5 columns
+    if rule == "uniqueness":
+        return string[:2] + numeric[:1]
+    return []
+
+
+def _stub_explanation(failure: Dict) -> str:
+    agg, column = failure.get("aggregate"), failure.get("column")
+    sas, sf = failure.get("sas_value"), failure.get("sf_value")
+    try:
+        diff = float(sf) - float(sas)
+        delta = f" (Snowflake {'+' if diff >= 0 else ''}{diff:g}{f', {diff / float(sas):+.2%}' if float(sas) else ''})"
+    except (TypeError, ValueError):
+        delta = ""
+    target = f" of {column}" if column else ""
+    if agg == "count":
+        return f"Row counts differ{delta}: check load filters, rejected rows and duplicate loads between the SAS extract and Snowflake."
+    if agg == "sum":
+        return f"Totals{target} differ{delta}: check numeric precision/rounding, the column's transform and rows missing on either side."
+    if agg == "nunique":
+        return f"Distinct values{target} differ{delta}: check key normalization (CAST, trimming, case) and duplicated or dropped keys."
+    if agg == "nulls":
+        return f"Null counts{target} differ{delta}: check how blanks, SAS missing values and defaults are loaded (empty string vs NULL)."
+    if agg == "unique":
+        return f"Uniqueness{target} differs: check for duplicate loads or a changed business key."
+    return f"Values differ{delta}: compare the mapping transforms of {failure.get('test')} on both sides."
+
+
+def default_backend():
+    """Backend named by LLM_BACKEND (only the local stub ships with the repo)"""
+    name = os.environ.get("LLM_BACKEND", "stub")
+    if name == "stub":
+        return StubBackend()
+    raise ValueError(f"Unknown LLM_BACKEND {name!r}; pass a backend object to LLMClient instead")
+
+
+# ---------------------------
+# Client
+# ---------------------------
+class LLMClient:
+    """Cached, de-duplicated and batched model calls (see the module comment)"""
+
+    def __init__(self, backend=None, cache: Optional[ResponseCache] = None):
+        self.backend = backend if backend is not None else default_backend()
+        self.cache = cache if cache is not None else ResponseCache()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.backend_calls = 0
+        self.prompt_chars = 0
+
+    def _resolve(self, keys: Sequence[str], call: Callable[[List[int]], List[str]]) -> List[str]:
+        """
+        Responses for keys: from the cache, from an identical request in flight, or from one
+        call(positions) for all remaining keys (which returns their responses in order).
+        """
+        results: List[Optional[str]] = [None] * len(keys)
+        owned, waiting = {}, []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self.cache.get(key)
+                if cached is not None:
+                    results[i] = cached
+                elif key in self._inflight:
+                    waiting.append((i, self._inflight[key]))
+                else:
+                    owned[i] = self._inflight[key] = Future()
+        if owned:
+            try:
+                responses = call(list(owned))
+                if len(responses) != len(owned):
+                    raise ValueError(f"Model returned {len(responses)} answers for {len(owned)} requests")
+            except Exception as e:
+                with self._lock:
+                    for i, future in owned.items():
+                        self._inflight.pop(keys[i], None)
+                        future.set_exception(e)
+                raise
+            with self._lock:
+                for (i, future), response in zip(owned.items(), responses):
+                    self.cache.put(keys[i], response)
+                    self._inflight.pop(keys[i], None)
+                    future.set_result(response)
+                    results[i] = response
+        for i, future in waiting:
+            results[i] = future.result()
+        return results
+
+    def _call(self, task: str, prompt: str, context=None) -> str:
+        self.backend_calls += 1
+        self.prompt_chars += len(prompt)
+        return self.backend.complete(task, prompt, context)
+
+    def complete(self, task: str, prompt: str, context=None) -> str:
+        """One cached model call"""
+        return self._resolve([request_key(task, prompt, context)], lambda _: [self._call(task, prompt, context)])[0]
+
+    def suggest_columns(self, rule: str, df: pd.DataFrame) -> List[str]:
+        """Columns of df best suited to a validation rule (sum_amount, distinct_count, not_null, uniqueness)"""
+        context = {"rule": rule, "columns": df.columns.tolist(),
+                   "numeric": df.select_dtypes(include="number").columns.tolist(),
+                   "string": df.select_dtypes(include="object").columns.tolist()}
+        prompt = (f"Suggest up to 5 columns to validate with the rule {rule}, best first, as a JSON list of names.\n"
+                  f"Numeric columns: {', '.join(context['numeric'])}\n"
+                  f"Text columns: {', '.join(context['string'])}\n"
+                  f"All columns: {', '.join(context['columns'])}")
+        suggestions = json.loads(self.complete("suggest_columns", prompt, context))
+        return [c for c in suggestions if c in context["columns"]]
+
+    def explain_failures(self, failures: List[Dict], context: Optional[List[Dict]] = None) -> List[str]:
+        """
+        Likely cause and fix for each failed test (dicts with table, test, aggregate, column,
+        sas_value, sf_value). Cached per failure; the uncached ones go to the model in one call.
+        context: retrieved knowledge-base documents (retrieval_index.context_for_table).
+        """
+        lines = [f"{f.get('table')}.{f.get('test')}: {f.get('aggregate')}({f.get('column') or '*'}) "
+                 f"SAS={f.get('sas_value')} Snowflake={f.get('sf_value')}" for f in failures]
+        docs = [{"id": d["id"], "text": d["text"]} for d in context or []]
+        keys = [request_key("explain_failure", line, docs) for line in lines]
+
+        def call(positions):
+            prompt = ("These checks of a SAS → Snowflake migration failed. For each, give the likely cause and a fix, "
+                      "as a JSON list of strings in the same order.\n" + "\n".join(lines[i] for i in positions))
+            if docs:
+                prompt += "\n\nContext:\n" + "\n\n".join(f"[{d['id']}]\n{d['text']}" for d in docs)
+            return json.loads(self._call("explain_failures", prompt, {"failures": [failures[i] for i in positions],
+                                                                       "documents": docs}))
+
+        return self._resolve(keys, call)
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "backend_calls": self.backend_calls, "prompt_chars": self.prompt_chars}
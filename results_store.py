@@ -0,0 +1,228 @@
+import argparse
+import logging
+import math
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+# ---------------------------
+# Persistent, indexed store of validation results
+# ---------------------------
+#Every run appends one row per test/rule; history, drift of the SAS/Snowflake values and the
+#latest status per table are indexed queries. Appends are queued and written in batches by a
+#background thread, so recording results never waits on disk.
+
+#Execution
+#python results_store.py --db validation_results.db latest
+#python results_store.py --db validation_results.db drift --table transaction --rule sum_amount
+DEFAULT_RESULTS_DB = os.environ.get("RESULTS_DB", "validation_results.db")
+log = logging.getLogger(__name__)
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS validation_results ("
+    " run_id TEXT, run_ts TEXT, source TEXT, table_name TEXT, rule TEXT, column_name TEXT,"
+    " status TEXT, sas_value REAL, sf_value REAL, explanation TEXT)",
+    "CREATE INDEX IF NOT EXISTS ix_results_series ON validation_results (table_name, rule, column_name, run_ts)",
+    "CREATE INDEX IF NOT EXISTS ix_results_run_ts ON validation_results (run_ts)",
+    "CREATE INDEX IF NOT EXISTS ix_results_run ON validation_results (run_id)",
+]
+_COLUMNS = ["run_id", "run_ts", "source", "table_name", "rule", "column_name", "status", "sas_value", "sf_value", "explanation"]
+
+
+def new_run(source: str) -> Dict[str, str]:
+    """Id + UTC timestamp shared by all results of one validation run"""
+    return {"run_id": uuid.uuid4().hex, "run_ts": datetime.now(timezone.utc).isoformat(), "source": source}
+
+
+def _number(value) -> Optional[float]:
+    #Values are counts, sums or booleans (Uniqueness); anything else is kept in the explanation only
+    if isinstance(value, bool) or (hasattr(value, "dtype") and value.dtype == bool):
+        return float(bool(value))
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+class ResultsStore:
+    """
+    SQLite-backed results history (one file, WAL so readers never block the writer).
+    append() only enqueues; a daemon thread writes queued rows in batches of up to batch_size.
+    A batch that cannot be written is logged and dropped, and the writer keeps going;
+    the next flush() or close() raises it, so lost results are never silent.
+    """
+
+    def __init__(self, path: str = DEFAULT_RESULTS_DB, batch_size: int = 1000):
+        self.path = path
+        self.batch_size = batch_size
+        con = self._connect()
+        con.execute("PRAGMA journal_mode=WAL")
+        for ddl in _SCHEMA:
+            con.execute(ddl)
+        con.commit()
+        con.close()
+        self._queue = queue.Queue()
+        self._error: Optional[Exception] = None
+        self._lost = 0
+        self._writer = threading.Thread(target=self._write_loop, name="results-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+
+    def append(self, run: Dict[str, str], table: str, rows: Iterable[Dict]) -> None:
+        """
+        Queue results of one table for a run (see new_run). Each row has rule, column (optional),
+        status, sas_value, sf_value and explanation (optional).
+        """
+        self._queue.put([
+            (run["run_id"], run["run_ts"], run.get("source"), table, r["rule"], r.get("column"), r["status"],
+             _number(r.get("sas_value")), _number(r.get("sf_value")), r.get("explanation"))
+            for r in rows
+        ])
+
+    def _write_loop(self) -> None:
+        con = self._connect()
+        while True:
+            item = self._queue.get()
+            batch, done = [], []
+            #Drain whatever else is already queued into the same transaction
+            while True:
+                if isinstance(item, threading.Event):
+                    done.append(item)
+                elif item is not None:
+                    batch.extend(item)
+                if len(batch) >= self.batch_size or item is None:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    with con:
+                        con.executemany(f"INSERT INTO validation_results VALUES ({', '.join('?' * len(_COLUMNS))})", batch)
+            except Exception as e:
+                log.exception("Could not write %d validation results to %s", len(batch), self.path)
+                self._error = e
+                self._lost += len(batch)
+            finally:
+                #Waiting flush() / close() calls are released even when the write failed
+                for event in done:
+                    event.set()
+            if item is None:
+                con.close()
+                return
+
+    def _raise_write_error(self) -> None:
+        error, lost = self._error, self._lost
+        if error is not None:
+            self._error, self._lost = None, 0
+            raise RuntimeError(f"{lost} validation results could not be written to {self.path}") from error
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until everything appended so far is written; raises if any of it could not be"""
+        event = threading.Event()
+        self._queue.put(event)
+        event.wait(timeout)
+        self._raise_write_error()
+
+    def close(self) -> None:
+        """Write what is still queued and stop the writer; raises if results were lost since the last flush"""
+        self._queue.put(None)
+        self._writer.join()
+        self._raise_write_error()
+
+    #Queries (each on its own short-lived connection, so they can run from any thread)
+    def _query(self, sql: str, params: List) -> pd.DataFrame:
+        con = self._connect()
+        try:
+            return pd.read_sql_query(sql, con, params=params)
+        finally:
+            con.close()
+
+    @staticmethod
+    def _where(table: Optional[str], rule: Optional[str], column: Optional[str], since: Optional[str]):
+        clauses, params = [], []
+        for name, value in (("table_name", table), ("rule", rule), ("column_name", column)):
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("run_ts >= ?")
+            params.append(since)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def history(self, table: Optional[str] = None, rule: Optional[str] = None, column: Optional[str] = None,
+                since: Optional[str] = None, limit: int = 1000) -> pd.DataFrame:
+        """Results, newest first, optionally narrowed to a table / rule / column / runs since an ISO timestamp"""
+        where, params = self._where(table, rule, column, since)
+        return self._query(f"SELECT {', '.join(_COLUMNS)} FROM validation_results{where}"
+                           f" ORDER BY run_ts DESC LIMIT ?", params + [limit])
+
+    def drift(self, table: str, rule: str, column: Optional[str] = None, since: Optional[str] = None) -> pd.DataFrame:
+        """sas_value / sf_value of one check over time (oldest first), with their difference"""
+        where, params = self._where(table, rule, column, since)
+        df = self._query(f"SELECT run_ts, column_name, status, sas_value, sf_value FROM validation_results{where}"
+                         f" ORDER BY run_ts", params)
+        df["diff"] = df["sf_value"] - df["sas_value"]
+        return df
+
+    def latest_status(self, table: Optional[str] = None) -> pd.DataFrame:
+        """Most recent result of every (table, rule, column)"""
+        where, params = self._where(table, None, None, None)
+        #Ties on run_ts (runs within the same microsecond) go to the row appended last
+        return self._query(
+            "SELECT table_name, rule, column_name, status, sas_value, sf_value, run_ts FROM ("
+            "  SELECT *, ROW_NUMBER() OVER (PARTITION BY table_name, rule, column_name"
+            f"  ORDER BY run_ts DESC, rowid DESC) AS n FROM validation_results{where})"
+            " WHERE n = 1 ORDER BY table_name, rule, column_name", params)
+
+    def pass_rate(self, since: Optional[str] = None) -> pd.DataFrame:
+        """Runs, passes and failures per table"""
+        where, params = self._where(None, None, None, since)
+        return self._query(
+            "SELECT table_name, COUNT(DISTINCT run_id) AS runs, SUM(status = 'PASS') AS passed,"
+            f" SUM(status = 'FAIL') AS failed, MAX(run_ts) AS last_run FROM validation_results{where}"
+            " GROUP BY table_name ORDER BY table_name", params)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the validation results history")
+    parser.add_argument("--db", default=DEFAULT_RESULTS_DB, help="Results store (SQLite file)")
+    parser.add_argument("query", choices=["latest", "history", "drift", "pass-rate"])
+    parser.add_argument("--table", default=None)
+    parser.add_argument("--rule", default=None)
+    parser.add_argument("--column", default=None)
+    parser.add_argument("--since", default=None, help="ISO timestamp, e.g. 2025-08-01")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        parser.error(f"No results store at {args.db}")
+
+    store = ResultsStore(args.db)
+    if args.query == "latest":
+        df = store.latest_status(args.table)
+    elif args.query == "history":
+        df = store.history(args.table, args.rule, args.column, args.since, args.limit)
+    elif args.query == "drift":
+        if not (args.table and args.rule):
+            parser.error("drift needs --table and --rule")
+        df = store.drift(args.table, args.rule, args.column, args.since)
+    else:
+        df = store.pass_rate(args.since)
+    store.close()
+    print(df.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+import argparse
+import hashlib
+import heapq
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from knowledge_base import MAPPINGS, VALIDATION_TEMPLATES
+from lineage_diff import lineage_links
+from lineage_graph import table_key
+from lineage_reader import read_lineage
+
+# ---------------------------
+# Local retrieval index (the "R" of the knowledge base)
+# ---------------------------
+#BM25 over mappings, validation templates, SAS program steps and lineage jobs, persisted in one
+#SQLite file: postings are looked up per query term through the (term, doc_id) primary key, and
+#only document lengths are held in memory, so opening a large index is instant and a top-k query
+#touches only the postings of its terms. Documents carry a content digest, so re-adding a source
+#only re-indexes the documents that changed.
+
+#Execution
+#python retrieval_index.py --index kb_index.db add-kb
+#python retrieval_index.py --index kb_index.db add-sas monthly_amb.sas
+#python retrieval_index.py --index kb_index.db add-lineage sas_lineage.json
+#python retrieval_index.py --index kb_index.db search "average monthly balance" -k 5
+DEFAULT_INDEX_PATH = os.environ.get("KB_INDEX", "kb_index.db")
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS documents ("
+    " doc_id TEXT PRIMARY KEY, kind TEXT, table_name TEXT, digest TEXT, length INTEGER, text TEXT)",
+    "CREATE TABLE IF NOT EXISTS postings ("
+    " term TEXT, doc_id TEXT, tf INTEGER, PRIMARY KEY (term, doc_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS ix_postings_doc ON postings (doc_id)",
+]
+_TOKEN = re.compile(r"[a-z0-9_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case words; snake_case names also count as their parts (end_of_day_balance → end, day, balance)"""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if "_" in token:
+            tokens.extend(part for part in token.split("_") if part)
+    return tokens
+
+
+def _digest(doc: Dict) -> str:
+    return hashlib.blake2b(f"{doc['kind']}\0{doc.get('table')}\0{doc['text']}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+class RetrievalIndex:
+    """
+    Persistent BM25 index. Documents are dicts with id, kind (mapping, template, sas, lineage, ...),
+    table (the MAPPINGS-style table they are about, or None) and text.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self._con = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._lock = threading.Lock()
+        for ddl in _SCHEMA:
+            self._con.execute(ddl)
+        self._con.commit()
+        self._version = None
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """
+        (Re)load doc_id → (length, digest), from which N and the average length for BM25 follow,
+        when another connection (a second worker or the CLI) has committed since the last load.
+        PRAGMA data_version only changes for other connections' commits, not this one's.
+        """
+        version = self._con.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._version:
+            return
+        self._docs: Dict[str, tuple] = {doc_id: (length, digest) for doc_id, length, digest
+                                        in self._con.execute("SELECT doc_id, length, digest FROM documents")}
+        self._total_length = sum(length for length, _ in self._docs.values())
+        self._version = version
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._docs)
+
+    def _remove(self, doc_id: str) -> None:
+        length, _ = self._docs.pop(doc_id)
+        self._total_length -= length
+        self._con.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self._con.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+
+    def upsert(self, docs: Iterable[Dict]) -> Dict[str, int]:
+        """Add new documents and re-index changed ones (same id, different content); unchanged ones are skipped"""
+        counts = {"added": 0, "updated": 0, "unchanged": 0}
+        with self._lock, self._con:
+            self._refresh()
+            for doc in docs:
+                digest = _digest(doc)
+                known = self._docs.get(doc["id"])
+                if known is not None and known[1] == digest:
+                    counts["unchanged"] += 1
+                    continue
+                if known is not None:
+                    self._remove(doc["id"])
+                tf = Counter(tokenize(doc["text"]))
+                length = sum(tf.values())
+                self._con.execute("INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?)",
+                                  (doc["id"], doc["kind"], doc.get("table"), digest, length, doc["text"]))
+                self._con.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                                      [(term, doc["id"], n) for term, n in tf.items()])
+                self._docs[doc["id"]] = (length, digest)
+                self._total_length += length
+                counts["updated" if known is not None else "added"] += 1
+        return counts
+
+    def sync(self, prefix: str, docs: Iterable[Dict]) -> Dict[str, int]:
+        """upsert the current documents of one source (ids starting with prefix) and drop the ones it no longer has"""
+        docs = list(docs)
+        counts = self.upsert(docs)
+        current = {doc["id"] for doc in docs}
+        with self._lock:
+            stale = [doc_id for doc_id in self._docs if doc_id.startswith(prefix) and doc_id not in current]
+        counts["removed"] = self.delete(stale)
+        return counts
+
+    def delete(self, doc_ids: Iterable[str]) -> int:
+        removed = 0
+        with self._lock, self._con:
+            self._refresh()
+            for doc_id in doc_ids:
+                if doc_id in self._docs:
+                    self._remove(doc_id)
+                    removed += 1
+        return removed
+
+    def search(self, query: str, k: int = 5, kind: Optional[str] = None, table: Optional[str] = None) -> List[Dict]:
+        """Top-k documents by BM25 score, optionally only of one kind and/or about one table"""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        scores = defaultdict(float)
+        with self._lock:
+            self._refresh()
+            if not self._docs:
+                return []
+            n_docs = len(self._docs)
+            avg_length = self._total_length / n_docs
+            for term in terms:
+                postings = self._con.execute("SELECT doc_id, tf FROM postings WHERE term = ?", (term,)).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings:
+                    if doc_id not in self._docs:
+                        #Written by another connection after the refresh above; picked up by the next query
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._docs[doc_id][0] / avg_length)
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+            if kind is not None or table is not None:
+                allowed = {doc_id for (doc_id,) in self._con.execute(
+                    "SELECT doc_id FROM documents WHERE (? IS NULL OR kind = ?) AND (? IS NULL OR table_name = ?)",
+                    (kind, kind, table, table))}
+                scores = {doc_id: s for doc_id, s in scores.items() if doc_id in allowed}
+            top = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+            rows = {row[0]: row for row in self._con.execute(
+                f"SELECT doc_id, kind, table_name, text FROM documents WHERE doc_id IN ({', '.join('?' * len(top))})",
+                [doc_id for doc_id, _ in top])} if top else {}
+        return [{"id": doc_id, "kind": rows[doc_id][1], "table": rows[doc_id][2], "score": round(score, 4),
+                 "text": rows[doc_id][3]} for doc_id, score in top if doc_id in rows]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._refresh()
+            kinds = dict(self._con.execute("SELECT kind, COUNT(*) FROM documents GROUP BY kind").fetchall())
+            terms = self._con.execute("SELECT COUNT(DISTINCT term) FROM postings").fetchone()[0]
+            documents = len(self._docs)
+        return {"documents": documents, "terms": terms, "by_kind": kinds}
+
+    def close(self) -> None:
+        self._con.close()
+
+
+# ---------------------------
+# Documents from the knowledge sources
+# ---------------------------
+def mapping_documents(mappings: Dict[str, Dict] = MAPPINGS) -> List[Dict]:
+    """One document per mapped table: names, keys, partitioning and every column with its transform"""
+    docs = []
+    for table, mapping in mappings.items():
+        lines = [f"table {table} sas_table {mapping['sas_table']} sf_table {mapping['sf_table']}",
+                 f"keys {' '.join(mapping.get('keys', []))}"]
+        if mapping.get("partition_by"):
+            lines.append(f"partition_by {mapping['partition_by']}")
+        for col in mapping.get("columns", []):
+            extras = " ".join(f"{k} {v}" for k, v in col.items() if k not in ("src", "tgt"))
+            lines.append(f"column {col['src']} → {col['tgt']} {extras}".rstrip())
+        docs.append({"id": f"mapping:{table}", "kind": "mapping", "table": table, "text": "\n".join(lines)})
+    return docs
+
+
+def template_documents(templates: List[Dict] = VALIDATION_TEMPLATES) -> List[Dict]:
+    return [{"id": f"template:{t['name']}", "kind": "template", "table": None, "text": f"{t['name']}: {t['desc']}"}
+            for t in templates]
+
+
+def sync_knowledge_base(index: RetrievalIndex) -> Dict[str, int]:
+    """Bring the index up to date with MAPPINGS and VALIDATION_TEMPLATES (only changed entries are re-indexed)"""
+    counts = Counter(index.sync("mapping:", mapping_documents()))
+    counts.update(index.sync("template:", template_documents()))
+    return dict(counts)
+
+
+#A SAS program step ends at run; or quit; — each step becomes one document
+_SAS_STEP_END = re.compile(r"\b(?:run|quit)\s*;", re.IGNORECASE)
+_SAS_TARGET = re.compile(r"\b(?:data|create\s+table|base\s*=)\s*([A-Za-z_][\w.]*)", re.IGNORECASE)
+
+
+def sas_documents(name: str, source: str) -> List[Dict]:
+    """One document per DATA/PROC step of a SAS program, about the dataset the step writes"""
+    docs = []
+    start = 0
+    steps = []
+    for match in _SAS_STEP_END.finditer(source):
+        steps.append(source[start:match.end()])
+        start = match.end()
+    if source[start:].strip():
+        steps.append(source[start:])
+    for i, step in enumerate(s for s in steps if s.strip()):
+        target = _SAS_TARGET.search(step)
+        docs.append({"id": f"sas:{name}:{i}", "kind": "sas", "table": table_key(target.group(1)) if target else None,
+                     "text": step.strip()})
+    return docs
+
+
+def lineage_documents(name: str, lineage) -> List[Dict]:
+    """
+    One document per job (or per target table when the export has no jobs): what it reads, what
+    it writes and its source code highlights. lineage is anything lineage_diff.lineage_links reads.
+    """
+    jobs = defaultdict(lambda: {"sources": set(), "targets": set(), "highlights": set()})
+    for source, target, job, highlights in lineage_links(lineage):
+        entry = jobs[job or f"→ {target}"]
+        entry["sources"].add(source)
+        entry["targets"].add(target)
+        entry["highlights"].update(h[2] for h in highlights if h[2])
+    docs = []
+    for job, entry in jobs.items():
+        text = f"job {job}\nreads {' '.join(sorted(entry['sources']))}\nwrites {' '.join(sorted(entry['targets']))}"
+        if entry["highlights"]:
+            text += "\nhighlights " + "\n".join(sorted(entry["highlights"]))
+        targets = sorted({table_key(t) for t in entry["targets"]})
+        docs.append({"id": f"lineage:{name}:{job}", "kind": "lineage", "table": targets[0] if len(targets) == 1 else None,
+                     "text": text})
+    return docs
+
+
+def table_query(table: str) -> str:
+    """Retrieval query for a MAPPINGS table: its names and column names"""
+    mapping = MAPPINGS.get(table, {})
+    words = [table, mapping.get("sas_table", ""), mapping.get("sf_table", "")]
+    words += [col["tgt"] for col in mapping.get("columns", [])]
+    return " ".join(words)
+
+
+def context_for_table(index: RetrievalIndex, table: str, k: int = 5) -> List[Dict]:
+    """
+    The k documents most relevant to a table (shown with its tests, sent with failure explanations): its own mapping first, then the
+    best templates, SAS steps and lineage jobs (other tables' mappings share column names but not rules)
+    """
+    query = table_query(table)
+    own = index.search(query, 1, kind="mapping", table=table)
+    others = [doc for doc in index.search(query, k + len(MAPPINGS)) if doc["kind"] != "mapping"]
+    return (own + others)[:k]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build and query the local retrieval index of the knowledge base")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index file (SQLite)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("add-kb", help="Index MAPPINGS and VALIDATION_TEMPLATES")
+    add_sas = sub.add_parser("add-sas", help="Index SAS programs (one document per step)")
+    add_sas.add_argument("files", nargs="+")
+    add_lineage = sub.add_parser("add-lineage", help="Index lineage exports (one document per job)")
+    add_lineage.add_argument("files", nargs="+")
+    search = sub.add_parser("search")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=5)
+    search.add_argument("--kind", default=None)
+    search.add_argument("--table", default=None)
+    sub.add_parser("stats")
+    args = parser.parse_args(argv)
+
+    index = RetrievalIndex(args.index)
+    try:
+        if args.command == "add-kb":
+            print(sync_knowledge_base(index))
+        elif args.command == "add-sas":
+            for path in args.files:
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    name = os.path.basename(path)
+                    print(path, index.sync(f"sas:{name}:", sas_documents(name, f.read())))
+        elif args.command == "add-lineage":
+            for path in args.files:
+                name = os.path.basename(path)
+                print(path, index.sync(f"lineage:{name}:", lineage_documents(name, read_lineage(path))))
+        elif args.command == "search":
+            for hit in index.search(args.query, args.k, args.kind, args.table):
+                first_line = hit["text"].splitlines()[0] if hit["text"] else ""
+                print(f"{hit['score']:8.3f}  {hit['id']}  {first_line[:80]}")
+        else:
+            print(index.stats())
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import os
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from instrumentation import StageProfiler, stage
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# ---------------------------
+# SAS dataset loading helpers shared by app.py / app2.py
+# ---------------------------
+
+#Convert the raw byte values (ASCII codes) instead of decoded strings
+def decode_value(x):
+    if isinstance(x, (bytes, bytearray)):
+        #E.g. b'Alice' → decoded to "Alice"
+        #.strip() cleans trailing spaces from SAS fixed-width CHAR fields.
+        return x.decode("utf-8", errors="ignore").strip()
+    if isinstance(x, (list, tuple)) or hasattr(x, "__iter__") and not isinstance(x, str):
+        try:
+            #Example [65,108,105,99,101] → converted to bytes([65,108,105,99,101])
+            # = b"Alice" → "Alice"
+            #.strip() cleans trailing spaces from SAS fixed-width CHAR fields.
+            return bytes(x).decode("utf-8", errors="ignore").strip()
+        except Exception:
+            return x
+    return x
+
+
+def _is_text_column(s: pd.Series) -> bool:
+    #object columns hold the raw SAS bytes; "str"/"string" columns come from read_sas(encoding=...)
+    return s.dtype == object or isinstance(s.dtype, pd.StringDtype)
+
+
+def decode_sas_columns(df: pd.DataFrame, encoding: str = "utf-8") -> Tuple[pd.DataFrame, float]:
+    """
+    Decode SAS character columns column-by-column instead of calling decode_value per cell.
+    Numeric and datetime columns are left untouched.
+
+    Returns the decoded frame and the elapsed seconds.
+    """
+    start = time.perf_counter()
+    df = df.copy(deep=False)
+
+    for col in df.columns:
+        s = df[col]
+        if not _is_text_column(s):
+            continue
+
+        valid = s.notna().to_numpy()
+        if not valid.any():
+            continue
+
+        #.str.strip() cleans trailing spaces from SAS fixed-width CHAR fields.
+        if isinstance(s.iloc[int(valid.argmax())], (bytes, bytearray)):
+            decoded = s.str.decode(encoding, errors="ignore").str.strip()
+        else:
+            decoded = s.str.strip()
+
+        #Cells the .str accessor could not handle (mixed bytes/str, byte lists) come back
+        #as NaN; only those fall back to the per-cell decode_value
+        leftover = decoded.isna().to_numpy() & valid
+        if leftover.any():
+            decoded = decoded.astype(object)
+            decoded[leftover] = s[leftover].map(decode_value)
+        df[col] = decoded
+
+    return df, time.perf_counter() - start
+
+
+def read_sas_dataset(sas_file, encoding: str = "utf-8", perf: Optional[StageProfiler] = None) -> Tuple[pd.DataFrame, float]:
+    """
+    Read a .sas7bdat upload with the reader doing the byte → str decoding,
+    then strip the fixed-width padding. Column names are lower-cased.
+    With perf, the read / decode / lower-casing steps are recorded as separate stages.
+
+    Returns the frame and the seconds spent decoding.
+    """
+    with stage(perf, "read_sas") as rec:
+        sas_df = pd.read_sas(sas_file, format="sas7bdat", encoding=encoding)
+        rec["rows"] = len(sas_df)
+    with stage(perf, "decode_sas_columns", len(sas_df)):
+        sas_df, decode_secs = decode_sas_columns(sas_df, encoding=encoding)
+    with stage(perf, "lowercase_columns", len(sas_df)):
+        sas_df.columns = sas_df.columns.str.lower()
+    return sas_df, decode_secs
+
+
+def iter_sas_chunks(sas_file, chunksize: int = 100_000, encoding: str = "utf-8") -> Iterator[pd.DataFrame]:
+    """
+    Stream a .sas7bdat file chunk by chunk, each chunk decoded and with lower-cased columns.
+    Only one chunk is held in memory at a time.
+    """
+    if hasattr(sas_file, "seek"):
+        sas_file.seek(0)
+    with pd.read_sas(sas_file, format="sas7bdat", encoding=encoding, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk, _ = decode_sas_columns(chunk, encoding=encoding)
+            chunk.columns = chunk.columns.str.lower()
+            yield chunk
+
+
+# ---------------------------
+# One-time columnar (Arrow IPC / Parquet) copies of SAS datasets
+# ---------------------------
+COLUMNAR_SUFFIXES = {"arrow": ".arrow", "parquet": ".parquet"}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the columnar SAS copies (pip install pyarrow)")
+
+
+def columnar_path(sas_path: str, fmt: str = "arrow", out_dir: Optional[str] = None) -> str:
+    """Where the columnar copy of a .sas7bdat lives (next to it unless out_dir is given)"""
+    base = os.path.splitext(os.path.basename(sas_path))[0] + COLUMNAR_SUFFIXES[fmt]
+    return os.path.join(out_dir or os.path.dirname(os.path.abspath(sas_path)), base)
+
+
+def convert_sas_to_columnar(sas_path: str, out_path: Optional[str] = None, fmt: str = "arrow",
+                            chunksize: int = 100_000, encoding: str = "utf-8") -> str:
+    """
+    Convert a .sas7bdat into an Arrow IPC or Parquet file, chunk by chunk, with the SAS
+    character columns already decoded and column names lower-cased.
+    """
+    _require_pyarrow()
+    out_path = out_path or columnar_path(sas_path, fmt)
+    tmp_path = out_path + ".tmp"
+    writer = schema = None
+    try:
+        for chunk in iter_sas_chunks(sas_path, chunksize=chunksize, encoding=encoding):
+            if schema is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                #All-missing text columns in the first chunk would otherwise be typed null
+                schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in schema])
+                writer = pa.ipc.new_file(tmp_path, schema) if fmt == "arrow" else pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def ensure_columnar(sas_path: str, fmt: str = "arrow", out_dir: Optional[str] = None) -> str:
+    """Path of an up-to-date columnar copy, converting only if it is missing or older than the .sas7bdat"""
+    out_path = columnar_path(sas_path, fmt, out_dir)
+    if not os.path.exists(out_path) or os.path.getmtime(out_path) < os.path.getmtime(sas_path):
+        convert_sas_to_columnar(sas_path, out_path, fmt)
+    return out_path
+
+
+def read_columnar(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Open a columnar copy memory-mapped and materialize only the requested columns"""
+    _require_pyarrow()
+    if path.endswith(COLUMNAR_SUFFIXES["parquet"]):
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    return table.to_pandas()
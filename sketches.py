@@ -0,0 +1,86 @@
+import math
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# HyperLogLog distinct-count sketch
+# ---------------------------
+#Fixed memory (2**p one-byte registers) whatever the number of distinct values, and
+#mergeable: max() of the registers of two sketches is the sketch of the union, so
+#chunks, files and workers can each build one and combine them afterwards.
+
+
+MAX_PRECISION = 18
+#Smallest relative error MAX_PRECISION can deliver (3 * 1.04 / sqrt(2**18) ≈ 0.0061), rounded up for inputs
+MIN_RELATIVE_ERROR = math.ceil(3 * 1.04 / math.sqrt(2 ** MAX_PRECISION) * 1000) / 1000
+
+
+def precision_for_error(rel_error: float) -> int:
+    """Smallest precision p whose ~3 standard errors (3 * 1.04 / sqrt(2**p)) stay within rel_error"""
+    if rel_error < MIN_RELATIVE_ERROR:
+        raise ValueError(f"Relative error {rel_error} is below what HyperLogLog precision {MAX_PRECISION} "
+                         f"can deliver; use at least {MIN_RELATIVE_ERROR}")
+    p = math.ceil(math.log2((3 * 1.04 / rel_error) ** 2))
+    return min(max(p, 4), MAX_PRECISION)
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    """Exact bit length of uint64 values (frexp is exact on each 32-bit half)"""
+    hi = (x >> np.uint64(32)).astype(np.float64)
+    lo = (x & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(hi > 0, 32 + np.frexp(hi)[1], np.frexp(lo)[1])
+
+
+class HyperLogLog:
+    def __init__(self, p: int = 14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    @classmethod
+    def for_error(cls, rel_error: float) -> "HyperLogLog":
+        return cls(precision_for_error(rel_error))
+
+    def add(self, values: Iterable) -> "HyperLogLog":
+        """Add a column of values (nulls are skipped), hashed vectorized to 64 bits"""
+        s = values if isinstance(values, pd.Series) else pd.Series(values)
+        s = s.dropna()
+        if s.empty:
+            return self
+        if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+            #1 and 1.0 must hash alike whichever dtype a chunk was parsed with
+            s = s.astype("float64")
+        h = pd.util.hash_array(s.to_numpy())
+        idx = (h >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = h << np.uint64(self.p)
+        #Position of the first 1-bit in the remaining 64-p bits
+        rank = np.minimum(64 - _bit_length(rest) + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError(f"Cannot merge sketches of precision {self.p} and {other.p}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> float:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            #Small range: linear counting is more accurate
+            return m * math.log(m / zeros)
+        return float(raw)
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.p]) + self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        sketch = cls(data[0])
+        sketch.registers = np.frombuffer(data[1:], dtype=np.uint8).copy()
+        return sketch
@@ -0,0 +1,88 @@
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (enables the multithreaded read_csv engine)
+    DEFAULT_CSV_ENGINE = "pyarrow"
+except ImportError:
+    DEFAULT_CSV_ENGINE = "c"
+
+# ---------------------------
+# Snowflake CSV export loading
+# ---------------------------
+#dtype implied by a MAPPINGS transform when the column has no explicit "dtype"
+TRANSFORM_DTYPES = {
+    "0/1 to BOOLEAN": "boolean",
+}
+DATE_TRANSFORMS = {"SAS_DATE_TO_DATE", "SAS_DATETIME_TO_TIMESTAMP"}
+
+
+def mapping_csv_schema(mapping: Dict, header: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Derive read_csv dtype / parse_dates from a MAPPINGS entry.
+    Target columns are matched case-insensitively against the CSV header
+    (Snowflake exports usually upper-case them); unknown columns are left to inference.
+    """
+    by_lower = {c.lower(): c for c in header}
+    dtypes, parse_dates = {}, []
+    for col in mapping.get("columns", []):
+        name = by_lower.get(col["tgt"].lower())
+        if name is None:
+            continue
+        transform = col.get("transform")
+        if "dtype" in col:
+            dtypes[name] = col["dtype"]
+        elif transform in DATE_TRANSFORMS:
+            parse_dates.append(name)
+        elif transform in TRANSFORM_DTYPES:
+            dtypes[name] = TRANSFORM_DTYPES[transform]
+        elif col.get("masking"):
+            #Masked values (hashes) are opaque strings
+            dtypes[name] = "string"
+    return dtypes, parse_dates
+
+
+def _mapping_read_kwargs(sf_file, mapping: Optional[Dict], is_path: bool) -> Dict:
+    """dtype / parse_dates read_csv kwargs for a MAPPINGS entry (reads only the header)"""
+    if mapping is None:
+        return {}
+    header = pd.read_csv(sf_file, nrows=0).columns.tolist()
+    if not is_path:
+        sf_file.seek(0)
+    dtypes, parse_dates = mapping_csv_schema(mapping, header)
+    kwargs = {}
+    if dtypes:
+        kwargs["dtype"] = dtypes
+    if parse_dates:
+        kwargs["parse_dates"] = parse_dates
+    return kwargs
+
+
+def read_snowflake_csv(sf_file, mapping: Optional[Dict] = None, engine: str = DEFAULT_CSV_ENGINE) -> pd.DataFrame:
+    """
+    Parse a Snowflake CSV export straight from the upload buffer (or a memory-mapped path),
+    without the bytes → str → StringIO copies. With a MAPPINGS entry the mapped columns
+    get explicit dtypes instead of being inferred.
+    """
+    is_path = isinstance(sf_file, (str, os.PathLike))
+    if not is_path:
+        sf_file.seek(0)
+
+    kwargs = {"engine": engine, **_mapping_read_kwargs(sf_file, mapping, is_path)}
+    if is_path and engine == "c":
+        kwargs["memory_map"] = True
+
+    return pd.read_csv(sf_file, **kwargs)
+
+
+def iter_snowflake_csv_chunks(sf_file, mapping: Optional[Dict] = None, chunksize: int = 100_000) -> Iterator[pd.DataFrame]:
+    """Stream a Snowflake CSV export in chunks (C engine, the pyarrow engine cannot chunk), typed like read_snowflake_csv"""
+    is_path = isinstance(sf_file, (str, os.PathLike))
+    if not is_path:
+        sf_file.seek(0)
+
+    kwargs = {"chunksize": chunksize, **_mapping_read_kwargs(sf_file, mapping, is_path)}
+    with pd.read_csv(sf_file, **kwargs) as reader:
+        yield from reader
@@ -0,0 +1,218 @@
+import os
+import queue
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from validation_engine import rule_aggregate
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# ---------------------------
+# Push-down execution of the generated validation SQL
+# ---------------------------
+#generate_validation_tests already produces SQL against the Snowflake table names
+#(e.g. SELECT SUM(amount) FROM landing.transaction). These helpers run it on an embedded
+#engine holding the Snowflake extract, or on any DB-API connection (warehouse).
+
+
+def connect_embedded():
+    """In-memory analytical engine: DuckDB when installed, else SQLite"""
+    if duckdb is not None:
+        return duckdb.connect(":memory:")
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+def _is_duckdb(con) -> bool:
+    return duckdb is not None and isinstance(con, duckdb.DuckDBPyConnection)
+
+
+def load_extract(con, sf_table: str, data: Union[pd.DataFrame, str]) -> None:
+    """
+    Make a Snowflake extract (DataFrame or CSV path) queryable under its qualified
+    sf_table name (schema.table) on an embedded connection.
+    """
+    schema, _, table = sf_table.rpartition(".")
+    #Quoted, since table names like "transaction" are keywords in SQLite
+    quoted = f'"{schema}"."{table}"' if schema else f'"{table}"'
+    if _is_duckdb(con):
+        if schema:
+            con.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+        if isinstance(data, pd.DataFrame):
+            #Registered frames are only visible to this connection (not its cursors), so copy
+            #the pandas columns once into DuckDB's columnar storage
+            view = f"_extract_{schema}_{table}"
+            con.register(view, data)
+            con.execute(f"CREATE OR REPLACE TABLE {quoted} AS SELECT * FROM {view}")
+            con.unregister(view)
+        else:
+            #The CSV is parsed once by DuckDB's parallel reader straight into columnar storage
+            path = os.path.abspath(data).replace("'", "''")
+            con.execute(f"CREATE OR REPLACE TABLE {quoted} AS SELECT * FROM read_csv_auto('{path}')")
+        return
+
+    #SQLite: schemas are attached in-memory databases
+    if schema:
+        attached = {row[1] for row in con.execute("PRAGMA database_list")}
+        if schema not in attached:
+            con.execute(f"ATTACH DATABASE ':memory:' AS \"{schema}\"")
+    df = data if isinstance(data, pd.DataFrame) else pd.read_csv(data)
+    df.to_sql("_extract_load", con, if_exists="replace", index=False)
+    con.execute(f"DROP TABLE IF EXISTS {quoted}")
+    con.execute(f"CREATE TABLE {quoted} AS SELECT * FROM main._extract_load")
+    con.execute("DROP TABLE main._extract_load")
+    con.commit()
+
+
+# ---------------------------
+# Batching: compatible aggregate tests on one table → one multi-aggregate SELECT
+# ---------------------------
+_AGG_SQL = re.compile(r"^\s*SELECT\s+(?P<expr>.+?)\s+FROM\s+(?P<table>[\w.]+)(?:\s+WHERE\s+(?P<where>.+?))?\s*;?\s*$",
+                      re.IGNORECASE | re.DOTALL)
+_AGG_CALL = re.compile(r"^(?P<func>COUNT|SUM|MIN|MAX|AVG)\s*\(\s*(?P<distinct>DISTINCT\s+)?(?P<arg>.+?)\s*\)$",
+                       re.IGNORECASE | re.DOTALL)
+
+
+def _filtered_aggregate(expr: str, where: Optional[str]) -> Optional[str]:
+    """Rewrite AGG(x) ... WHERE cond as AGG(CASE WHEN cond THEN x END), so it can share a scan"""
+    if where is None:
+        return expr
+    call = _AGG_CALL.match(expr.strip())
+    if call is None:
+        return None
+    arg = "1" if call.group("arg") == "*" else call.group("arg")
+    return f"{call.group('func')}({call.group('distinct') or ''}CASE WHEN {where} THEN {arg} END)"
+
+
+def batch_queries(tests: Iterable[Dict]) -> List[Tuple[str, List[Dict]]]:
+    """
+    Merge tests of the form SELECT <aggregate> FROM <table> [WHERE ...] into one SELECT per table
+    (row_count, sum_amount, distinct_cust and null_email on one table become a single round trip).
+    Anything else is kept as its own query.
+    """
+    by_table, queries = {}, []
+    for test in tests:
+        match = _AGG_SQL.match(test["sql"])
+        expr = _filtered_aggregate(match.group("expr"), match.group("where")) if match else None
+        if expr is None:
+            queries.append((test["sql"], [test]))
+            continue
+        by_table.setdefault(match.group("table"), []).append((expr, test))
+
+    for table, items in by_table.items():
+        select = ", ".join(f"{expr} AS v{i}" for i, (expr, _) in enumerate(items))
+        queries.append((f"SELECT {select} FROM {table}", [test for _, test in items]))
+    return queries
+
+
+def run_query(con, sql: str) -> Tuple:
+    """First result row of one statement over a DB-API connection"""
+    cur = con.cursor()
+    try:
+        cur.execute(sql)
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    return row or ()
+
+
+def sql_aggregates(con, tests: Iterable[Dict]) -> Dict:
+    """
+    Snowflake-side values of the tests computed by running their "sql" on con (batched
+    into one SELECT per table), keyed like the validation plan so run_validation can
+    compare them unchanged.
+    """
+    values = {}
+    for sql, batch in batch_queries(tests):
+        row = run_query(con, sql)
+        for test, value in zip(batch, row):
+            #SUM over an empty table is NULL in SQL; pandas reports 0
+            values[rule_aggregate(test)] = 0 if value is None else value
+    return values
+
+
+# ---------------------------
+# Bounded connection pool + concurrent executor for warehouse-side checks
+# ---------------------------
+class ConnectionPool:
+    """At most `size` DB-API connections, created lazily by factory and handed out one caller at a time"""
+
+    def __init__(self, factory: Callable, size: int = 4, on_close: Optional[Callable] = None):
+        self.factory = factory
+        self.size = size
+        self._on_close = on_close
+        self._idle = queue.Queue()
+        self._created = []
+        self._slots = queue.Queue()
+        for _ in range(size):
+            self._slots.put(None)
+
+    @contextmanager
+    def connection(self):
+        self._slots.get()  # blocks while `size` connections are in use
+        try:
+            try:
+                con = self._idle.get_nowait()
+            except queue.Empty:
+                con = self.factory()
+                self._created.append(con)
+            try:
+                yield con
+            finally:
+                self._idle.put(con)
+        finally:
+            self._slots.put(None)
+
+    def close(self) -> None:
+        for con in {id(c): c for c in self._created}.values():
+            con.close()
+        self._created.clear()
+        if self._on_close is not None:
+            self._on_close()
+
+
+def embedded_pool(size: int = 4) -> ConnectionPool:
+    """
+    Pool over one in-memory embedded database, standing in for the warehouse.
+    DuckDB hands out cursors (independent connections to the same database);
+    SQLite in-memory databases are private to a connection, so that fallback shares one connection.
+    """
+    base = connect_embedded()
+    if _is_duckdb(base):
+        return ConnectionPool(base.cursor, size, on_close=base.close)
+    return ConnectionPool(lambda: base, 1, on_close=base.close)
+
+
+def run_batched(pool: ConnectionPool, tests_by_table: Dict[str, List[Dict]],
+                max_workers: Optional[int] = None) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """
+    Run the tests of many tables against the pool: one merged query per table, queries of
+    different tables in flight concurrently (bounded by the pool size).
+    Returns ({table: {aggregate spec: value}}, {table: error}): a table whose SQL fails (e.g. a
+    column missing from its extract) gets an error instead of values, the other tables still run.
+    """
+    def run(job):
+        with pool.connection() as con:
+            try:
+                return run_query(con, job[1]), None
+            except Exception as e:
+                return None, f"{type(e).__name__}: {e}"
+
+    jobs = [(table, sql, batch) for table, tests in tests_by_table.items() for sql, batch in batch_queries(tests)]
+    values = {table: {} for table in tests_by_table}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers or pool.size) as executor:
+        for (table, _, batch), (row, error) in zip(jobs, executor.map(run, jobs)):
+            if error is not None:
+                errors.setdefault(table, error)
+                continue
+            for test, value in zip(batch, row):
+                values[table][rule_aggregate(test)] = 0 if value is None else value
+    return {table: v for table, v in values.items() if table not in errors}, errors
@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from knowledge_base import MAPPINGS
+from row_compare import compare_row_hashes
+from sas_io import decode_sas_columns, decode_value, read_sas_dataset
+from snowflake_io import read_snowflake_csv
+from transforms import SAS_EPOCH, normalize_frames
+from validation_engine import compile_plan, execute_plan
+
+#Execution (from test_code/)
+#python benchmark.py --scales 10K 100K 1M --output bench.json
+#python benchmark.py --tables daily_balance --scales 10M --sas-files ../sample_data/*.sas7bdat
+#Every stage is timed on SAS-shaped (bytes text, float ids, SAS day offsets, as read_sas returns them
+#undecoded) and Snowflake-shaped (CSV export) copies of the same rows; results go out as JSON
+#so they can be compared release over release.
+
+# ---------------------------
+# Synthetic tables with the sample_data schemas
+# ---------------------------
+FIRST_NAMES = np.array(["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "Anil", "Priya", "Chen", "Sofia"])
+LAST_NAMES = np.array(["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Kothari", "Sharma", "Wang", "Rossi"])
+CITIES = np.array(["Austin", "Boston", "Chicago", "Denver", "Miami", "Pune", "Seattle"])
+STATES = np.array(["TX", "MA", "IL", "CO", "FL", "MH", "WA"])
+DOMAINS = np.array(["example.com", "gmail.com", "live.org", "outlook.net"])
+ACCOUNT_TYPES = np.array(["SAVINGS", "CHECKING", "CREDIT"])
+#The generated table, its SAS-shaped copy, the CSV parse and both normalized frames are all in memory
+#at once, so scales above this must be asked for explicitly (--max-rows)
+MAX_ROWS = 10_000_000
+
+
+def _dates(rng: np.random.Generator, rows: int, start: str, days: int) -> pd.Series:
+    return pd.Series(pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, rows), unit="D"))
+
+
+def _account_ids(rng: np.random.Generator, rows: int) -> pd.Series:
+    return pd.Series(rng.permutation(rows) + 10_000_000).astype(str)
+
+
+def make_customers(rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    first = pd.Series(rng.choice(FIRST_NAMES, rows))
+    last = pd.Series(rng.choice(LAST_NAMES, rows))
+    email = first.str.lower() + "." + last.str.lower() + "@" + pd.Series(rng.choice(DOMAINS, rows))
+    city = rng.integers(0, len(CITIES), rows)
+    return pd.DataFrame({
+        "customer_id": np.arange(1001, 1001 + rows),
+        "first_name": first,
+        "last_name": last,
+        "email": email.mask(rng.random(rows) < 0.01),
+        "Street_Address": pd.Series(rng.integers(1, 9999, rows)).astype(str) + " Main St",
+        "City": CITIES[city],
+        "State": STATES[city],
+        "Zipcode": rng.integers(10_000, 99_999, rows),
+        "birth_dt": _dates(rng, rows, "1950-01-01", 365 * 50),
+        "Age": rng.integers(18, 90, rows),
+    })
+
+
+def make_cust_accounts(rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    start = _dates(rng, rows, "2019-01-01", 2000)
+    active = rng.random(rows) < 6 / 7
+    return pd.DataFrame({
+        "customer_id": rng.integers(1001, 1001 + max(rows // 2, 1), rows),
+        "account_id": _account_ids(rng, rows),
+        "account_type": rng.choice(ACCOUNT_TYPES, rows),
+        "is_active": np.where(active, "ACTIVE", "INACTIVE"),
+        "start_date": start,
+        "end_date": (start + pd.to_timedelta(rng.integers(100, 1000, rows), unit="D")).mask(active),
+    })
+
+
+def make_daily_balance(rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    return pd.DataFrame({
+        "customer_id": rng.integers(1001, 1001 + max(rows // 60, 1), rows),
+        "account_id": _account_ids(rng, rows),
+        "date": _dates(rng, rows, "2025-07-01", 62),
+        "end_of_day_balance": rng.uniform(0, 10_000, rows).round(2),
+    })
+
+
+def make_monthly_amb(rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    return pd.DataFrame({
+        "customer_id": rng.integers(1001, 1001 + max(rows // 2, 1), rows),
+        "account_id": _account_ids(rng, rows),
+        "reporting_month_yyyymm": rng.choice([202507, 202508], rows),
+        "average_monthly_balance": rng.uniform(0, 10_000, rows).round(2),
+        "date_computed": _dates(rng, rows, "2025-08-01", 31),
+    })
+
+
+#Per table: generator, mapping (MAPPINGS where the table has one), key, and the column each rule runs on
+BENCH_TABLES = {
+    "customers": {
+        "make": make_customers,
+        "mapping": {"keys": ["customer_id"], "columns": [
+            {"src": c, "tgt": c} for c in ["customer_id", "first_name", "last_name", "email", "Street_Address",
+                                            "City", "State", "Zipcode", "Age"]
+        ] + [{"src": "birth_dt", "tgt": "birth_dt", "transform": "SAS_DATE_TO_DATE"}]},
+        "rules": {"sum": "age", "nunique": "customer_id", "nulls": "email", "unique": "customer_id"},
+    },
+    "cust_accounts": {
+        "make": make_cust_accounts,
+        "mapping": {"keys": ["account_id"], "columns": [
+            {"src": c, "tgt": c} for c in ["customer_id", "account_id", "account_type", "is_active"]
+        ] + [{"src": c, "tgt": c, "transform": "SAS_DATE_TO_DATE"} for c in ["start_date", "end_date"]]},
+        "rules": {"nunique": "customer_id", "nulls": "end_date", "unique": "account_id"},
+    },
+    "daily_balance": {
+        "make": make_daily_balance,
+        "mapping": MAPPINGS["daily_balance"],
+        "rules": {"sum": "end_of_day_balance", "nunique": "customer_id", "nulls": "end_of_day_balance", "unique": "account_id"},
+    },
+    "monthly_amb": {
+        "make": make_monthly_amb,
+        "mapping": MAPPINGS["monthly_amb"],
+        "rules": {"sum": "average_monthly_balance", "nunique": "customer_id", "nulls": "date_computed", "unique": "account_id"},
+    },
+}
+
+
+def to_sas_shape(df: pd.DataFrame) -> pd.DataFrame:
+    """The frame as pd.read_sas returns it without an encoding: numbers as float64, text as padded bytes, dates as day offsets"""
+    out = {}
+    for col, s in df.items():
+        if pd.api.types.is_datetime64_any_dtype(s):
+            out[col] = (s - SAS_EPOCH).dt.days.astype("float64")
+        elif pd.api.types.is_numeric_dtype(s):
+            out[col] = s.astype("float64")
+        else:
+            text = s.astype("string")
+            width = int(text.str.len().max() or 1)
+            #Fixed-width CHAR: right-padded; missing values stay NaN, as read_sas returns them
+            encoded = text.str.ljust(width).str.encode("utf-8").astype(object)
+            out[col] = encoded.where(text.notna(), np.nan)
+    return pd.DataFrame(out)
+
+
+def parse_scale(text: str) -> int:
+    """10K / 1M / 10M → rows"""
+    units = {"K": 1_000, "M": 1_000_000}
+    text = text.strip().upper()
+    return int(float(text[:-1]) * units[text[-1]]) if text[-1] in units else int(text)
+
+
+# ---------------------------
+# Timing
+# ---------------------------
+def timed(fn: Callable, repeat: int = 1):
+    """Best wall time over repeat runs (and the last result)"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _entry(table: str, rows: int, stage: str, seconds: Optional[float], **extra) -> Dict:
+    entry = {"table": table, "rows": rows, "stage": stage, "seconds": None if seconds is None else round(seconds, 6),
+             "rows_per_sec": round(rows / seconds) if seconds else None}
+    entry.update(extra)
+    return entry
+
+
+def bench_table(table: str, rows: int, seed: int = 42, repeat: int = 1, legacy_max_rows: int = 1_000_000,
+                workdir: Optional[str] = None) -> List[Dict]:
+    """Time every stage for one synthetic table at one scale"""
+    spec = BENCH_TABLES[table]
+    rng = np.random.default_rng(seed)
+    results = []
+
+    gen_secs, sf_df = timed(lambda: spec["make"](rows, rng))
+    results.append(_entry(table, rows, "generate", gen_secs))
+    sas_raw = to_sas_shape(sf_df)
+
+    #SAS text decoding: vectorized path vs the original per-cell decode_value
+    secs, (sas_df, _) = timed(lambda: decode_sas_columns(sas_raw.copy()), repeat)
+    sas_df.columns = sas_df.columns.str.lower()
+    results.append(_entry(table, rows, "decode_sas_columns", secs))
+    text_cols = [c for c in sas_raw.columns if sas_raw[c].dtype == object]
+    if rows <= legacy_max_rows:
+        secs, _ = timed(lambda: sas_raw[text_cols].map(decode_value), repeat)
+        results.append(_entry(table, rows, "decode_value", secs))
+    else:
+        results.append(_entry(table, rows, "decode_value", None, skipped=f"rows > legacy_max_rows ({legacy_max_rows})"))
+
+    #Snowflake CSV export parse, with every available engine
+    mapping = spec["mapping"]
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        csv_path = os.path.join(tmp, f"{table}.csv")
+        sf_df.to_csv(csv_path, index=False, date_format="%Y-%m-%d")
+        results.append(_entry(table, rows, "csv_bytes", None, bytes=os.path.getsize(csv_path)))
+        for engine in ("c", "pyarrow"):
+            try:
+                secs, parsed = timed(lambda: read_snowflake_csv(csv_path, mapping, engine=engine), repeat)
+            except ImportError as e:
+                results.append(_entry(table, rows, f"csv_parse_{engine}", None, skipped=str(e)))
+                continue
+            results.append(_entry(table, rows, f"csv_parse_{engine}", secs))
+        sf_parsed = parsed
+    sf_parsed.columns = sf_parsed.columns.str.lower()
+
+    secs, (sas_n, sf_n) = timed(lambda: normalize_frames(sas_df, sf_parsed, mapping), repeat)
+    results.append(_entry(table, rows, "normalize", secs))
+
+    #Each rule on its own, then all of them compiled into one pass
+    validations = [{"rule": "Row Count"}]
+    labels = {"sum": "Sum Amount", "nunique": "Distinct Count", "nulls": "Not Null", "unique": "Uniqueness"}
+    for agg, col in spec["rules"].items():
+        validations.append({"rule": labels[agg], "column": col})
+    for val in validations:
+        plan = compile_plan([val])
+        secs, _ = timed(lambda: (execute_plan(plan, sas_n), execute_plan(plan, sf_n)), repeat)
+        results.append(_entry(table, rows, f"rule:{val['rule']}", secs, column=val.get("column")))
+    plan = compile_plan(validations)
+    secs, _ = timed(lambda: (execute_plan(plan, sas_n), execute_plan(plan, sf_n)), repeat)
+    results.append(_entry(table, rows, "rules:one_pass", secs))
+
+    secs, cmp = timed(lambda: compare_row_hashes(sas_df, sf_parsed, mapping), repeat)
+    results.append(_entry(table, rows, "row_hash_compare", secs, matched=cmp["matched"],
+                          mismatched=cmp["missing"] + cmp["extra"] + cmp["changed"]))
+    return results
+
+
+def bench_sas_file(path: str, repeat: int = 1) -> List[Dict]:
+    """pd.read_sas (+ decoding) on a real .sas7bdat; synthetic data cannot be written in that format"""
+    table = os.path.splitext(os.path.basename(path))[0]
+    secs, raw = timed(lambda: pd.read_sas(path, format="sas7bdat"), repeat)
+    results = [_entry(table, len(raw), "read_sas", secs, file=path, bytes=os.path.getsize(path))]
+    secs, _ = timed(lambda: read_sas_dataset(path), repeat)
+    results.append(_entry(table, len(raw), "read_sas_dataset", secs, file=path))
+    return results
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"timestamp": datetime.now(timezone.utc).isoformat(), "commit": commit, "python": platform.python_version(),
+            "pandas": pd.__version__, "numpy": np.__version__, "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark load, decode and validation throughput")
+    parser.add_argument("--tables", nargs="*", default=list(BENCH_TABLES), choices=list(BENCH_TABLES))
+    parser.add_argument("--scales", nargs="*", default=["10K", "100K", "1M"], help="Rows per table, e.g. 10K 1M 10M")
+    parser.add_argument("--max-rows", type=parse_scale, default=MAX_ROWS,
+                        help="Refuse larger scales (every stage holds the whole table, several copies of it, in memory)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage (best time is kept)")
+    parser.add_argument("--legacy-max-rows", type=int, default=1_000_000, help="Skip the per-cell decode_value baseline above this")
+    parser.add_argument("--sas-files", nargs="*", default=[], help="Real .sas7bdat files to time pd.read_sas on")
+    parser.add_argument("--workdir", default=None, help="Where the temporary CSV exports are written")
+    parser.add_argument("--output", default="-", help="Results JSON file ('-' = stdout)")
+    args = parser.parse_args(argv)
+
+    scales = [parse_scale(scale) for scale in args.scales]
+    too_large = [scale for scale, rows in zip(args.scales, scales) if rows > args.max_rows]
+    if too_large:
+        parser.error(f"scales {', '.join(too_large)} exceed --max-rows {args.max_rows:,}; raise it only with enough memory")
+
+    results = []
+    for path in args.sas_files:
+        results.extend(bench_sas_file(path, args.repeat))
+    for rows in scales:
+        for table in args.tables:
+            print(f"{table} @ {rows:,} rows", file=sys.stderr)
+            results.extend(bench_table(table, rows, args.seed, args.repeat, args.legacy_max_rows, args.workdir))
+
+    payload = json.dumps({"environment": environment(), "results": results}, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
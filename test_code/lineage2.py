@@ -1,8 +1,13 @@
+import os
+import sys
 import streamlit as st
-from pyvis.network import Network
-import tempfile, json
+import json
 import streamlit.components.v1 as components
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lineage_diff import diff_lineage
+from lineage_graph import LineageGraph, cached_html
+
 # -----------------------------
 # Collibra-style lineage JSONs
 # -----------------------------
@@ -199,76 +204,24 @@ snowflake_lineage = [
 # --------------------------------
 # Function: Build and return graph
 # --------------------------------
+@st.cache_resource
+def lineage_graph(lineage_text: str) -> LineageGraph:
+    """Indexed graph of a lineage JSON, built once per distinct JSON content"""
+    return LineageGraph.from_collibra(json.loads(lineage_text))
+
+
 def build_lineage_graph(lineage_json, error_tables=None):
     """
-    Builds a PyVis graph from lineage JSON.
+    Renders the lineage JSON to PyVis HTML.
     Highlights nodes/edges in red if they are in error_tables.
-    
+    The HTML is cached by graph content + error tables, so reruns do not re-render.
+
     Parameters:
     - lineage_json: list of lineage links
     - error_tables: set or list of table names that should be highlighted in red
     """
-    if error_tables is None:
-        error_tables = set()
-    else:
-        error_tables = set(error_tables)
-
-    net = Network(height="300px", width="100%", notebook=False, directed=True)
-    #net.barnes_hut()
-    #net.barnes_hut(gravity=-20000, central_gravity=0.3, spring_length=200, spring_strength=0.01, damping=0.09)
-    #for hierarchical direction: UD = top-down layout and LR=left to right layout:
-    #net.set_options("""
-    #var options = {
-    #"layout": {
-    #    "hierarchical": {
-    #    "enabled": true,
-    #    "levelSeparation": 150,
-    #    "nodeSpacing": 150,
-    #    "treeSpacing": 200,
-    #    "direction": "LR", 
-    #    "sortMethod": "directed"
-    #    }
-    #},
-    #"physics": {"enabled": false}
-    #}
-    #""")
-
-    existing_nodes = set()  # keep track of nodes already added
-    for link in lineage_json:
-        src_table = link["src"]["parent"]["name"]
-        trg_table = link["trg"]["parent"]["name"]
-        job = link["source_code"]["transformation_display_name"]
-
-        # Determine node colors
-        nodes = [
-            (src_table, "skyblue"),
-            (trg_table, "lightgreen"),
-            (job, "orange")
-        ]
-        # Add nodes if they don't exist
-        for n, default_color in nodes:
-            color = "red" if n in error_tables else default_color
-            if n not in existing_nodes:
-                net.add_node(
-                    n,
-                    label=n,
-                    color=color,
-                    shape="dot" if n == job else "dot",
-                    font={"vadjust": -20}  # label above the node
-                )
-                existing_nodes.add(n)
-
-        # Add edges; color red if either end is an error table
-        src_edge_color = "red" if src_table in error_tables or job in error_tables else nodes[0]
-        trg_edge_color = "red" if trg_table in error_tables or job in error_tables else nodes[1]
-
-        net.add_edge(src_table, job)
-        net.add_edge(job, trg_table, color=trg_edge_color)
-
-    # Save to temp file
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".html")
-    net.write_html(tmp.name, open_browser=False)
-    return tmp.name
+    graph = lineage_graph(json.dumps(lineage_json, sort_keys=True))
+    return graph, cached_html(graph, error_tables or ())
 
 # --------------------------------
 # Streamlit UI
@@ -277,16 +230,40 @@ def build_lineage_graph(lineage_json, error_tables=None):
 st.title("📊 SAS vs Snowflake Lineage")
 
 sas_col, sf_col = st.columns(2)
-error_tables = ["MONTHLY_AMB", "table_Y"]
+#Tables whose lineage differs between SAS and Snowflake (missing/extra/rewired edges, highlights)
+compare_highlights = st.sidebar.checkbox("Compare source code highlights", value=False)
+lineage_report = diff_lineage(sas_lineage, snowflake_lineage, highlights=compare_highlights)
+sas_error_tables = set(lineage_report["error_tables"]["left"])
+error_tables = set(lineage_report["error_tables"]["right"])
+#Failed tables of a lineage-ordered batch run (batch_validate.py --lineage ... --output report.json)
+batch_report = st.sidebar.file_uploader("Batch report JSON", type=["json"])
+if batch_report is not None:
+    error_tables |= set(json.load(batch_report).get("error_tables", []))
 with sas_col:
     st.subheader("🔵 SAS Lineage")
-    sas_html = build_lineage_graph(sas_lineage, "SAS Lineage")
-    components.html(open(sas_html, 'r', encoding='utf-8').read(), height=300)
+    sas_graph, sas_html = build_lineage_graph(sas_lineage, sas_error_tables)
+    components.html(sas_html, height=300)
 
 with sf_col:
     st.subheader("🟠 Snowflake Lineage")
-    #sf_html = build_lineage_graph(snowflake_lineage, "Snowflake Lineage")
-    sf_html = build_lineage_graph(snowflake_lineage, error_tables)
-    #st.components.v1.html(open(sf_html).read(), height=500, scrolling=True)
-    components.html(open(sf_html, 'r', encoding='utf-8').read(), height=300)
+    sf_graph, sf_html = build_lineage_graph(snowflake_lineage, error_tables)
+    components.html(sf_html, height=300)
 
+if lineage_report["flagged_tables"]:
+    with st.expander(f"⚠️ Lineage differences ({len(lineage_report['flagged_tables'])} tables)"):
+        st.json({k: v for k, v in lineage_report.items() if k != "error_tables" and v})
+
+# --------------------------------
+# Impact analysis
+# --------------------------------
+st.subheader("🧭 Impact Analysis")
+impact_side = st.radio("Lineage", ["SAS", "Snowflake"], horizontal=True)
+impact_graph = sas_graph if impact_side == "SAS" else sf_graph
+impact_table = st.selectbox("Table", sorted(n for n, k in zip(impact_graph.names, impact_graph.kinds) if k != "job"))
+up_col, down_col = st.columns(2)
+with up_col:
+    st.write("**Upstream (built from):**")
+    st.write(impact_graph.upstream(impact_table, include_jobs=True) or "—")
+with down_col:
+    st.write("**Downstream (impacted):**")
+    st.write(impact_graph.downstream(impact_table, include_jobs=True) or "—")
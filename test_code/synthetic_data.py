@@ -1,98 +1,250 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta, date
-import random
-import uuid
+import argparse
+import os
+import sys
 from calendar import monthrange
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
 
-# -----------------------------
-# Load first 1000 customer rows
-# -----------------------------
-customers = pd.read_csv("../sample_data/customers.csv").head(1000)
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pa_csv = pq = None
+
+try:
+    import pyreadstat
+except ImportError:
+    pyreadstat = None
+
+#Execution (from test_code/)
+#python synthetic_data.py                                   → 1000 customers, Jul + Aug 2025, CSVs in ../sample_data
+#python synthetic_data.py --scale 400 --format parquet --out-dir /data/load_test --seed 7
+#Scale 1 = 1000 customers (~2000 accounts, ~124K DAILY_BALANCE rows); rows grow linearly with the scale.
+#Accounts are generated in chunks, so memory is bounded by --chunk-customers whatever the scale.
 
 # -----------------------------
-# Generate synthetic CUST_ACCOUNTS
+# Vectorized building blocks
 # -----------------------------
-account_types = ["SAVINGS", "CHECKING", "CREDIT"]
-
-cust_accounts_records = []
-for _, row in customers.iterrows():
-    num_accounts = random.randint(1, 3)
-    for _ in range(num_accounts):
-        account_id = str(uuid.uuid4())[:8]
-        account_type = random.choice(account_types)
-        is_active = random.choice(["ACTIVE", "ACTIVE", "ACTIVE", "ACTIVE","ACTIVE","ACTIVE","INACTIVE"])
-        start_date = datetime.now() - timedelta(days=random.randint(30, 2000))
-        end_date = None if is_active == "ACTIVE" else start_date + timedelta(days=random.randint(100, 1000))
-        cust_accounts_records.append({
-            "customer_id": row["customer_id"],
-            "account_id": account_id,
-            "account_type": account_type,
-            "is_active": is_active,
-            "start_date": start_date.date(),
-            "end_date": end_date.date() if end_date else None
-        })
-
-cust_accounts = pd.DataFrame(cust_accounts_records)
+ACCOUNT_TYPES = np.array(["SAVINGS", "CHECKING", "CREDIT"])
+HEX = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+def hex_ids(values: np.ndarray) -> np.ndarray:
+    """uint32 values → 8-char lowercase hex strings, without a Python loop"""
+    values = values.astype(np.uint32)
+    shifts = np.arange(28, -4, -4, dtype=np.uint32)
+    digits = HEX[(values[:, None] >> shifts) & np.uint32(0xF)]
+    return digits.view("S8").ravel().astype(str)
+
+
+def unique_account_ids(start: int, count: int, seed: int) -> np.ndarray:
+    """
+    Distinct, random-looking 8-hex account ids (like uuid4()[:8], but never colliding):
+    an odd multiplier makes i → a*i + b a bijection on 32-bit integers.
+    """
+    rng = np.random.default_rng([seed, 0xACC])
+    a, b = int(rng.integers(1, 2**31)) * 2 + 1, int(rng.integers(0, 2**32))
+    i = np.arange(start, start + count, dtype=np.uint64)
+    return hex_ids((i * np.uint64(a) + np.uint64(b)) & np.uint64(0xFFFFFFFF))
+
+
+def clipped_random_walk(start: np.ndarray, steps: np.ndarray) -> np.ndarray:
+    """
+    Balances b_t = max(0, b_{t-1} + step_t) for every row at once.
+    Closed form of that recursion: b_t = S_t - min(0, min_{k<=t} S_k) with S the cumulative sum from start.
+    """
+    walk = start[:, None] + np.cumsum(steps, axis=1)
+    return walk - np.minimum(np.minimum.accumulate(walk, axis=1), 0)
+
 
 # -----------------------------
-# Generate synthetic DAILY_BALANCE (July + August)
+# Generators
 # -----------------------------
-def simulate_month_balances(customer_id, account_id, year, month):
+def generate_cust_accounts(customer_ids: np.ndarray, rng: np.random.Generator, as_of: date,
+                           first_account: int, seed: int) -> pd.DataFrame:
+    """1-3 accounts per customer: type, ACTIVE (6 in 7) / INACTIVE, start date and end date for inactive ones"""
+    per_customer = rng.integers(1, 4, len(customer_ids))
+    n = int(per_customer.sum())
+    is_active = np.where(rng.random(n) < 6 / 7, "ACTIVE", "INACTIVE")
+    start_date = pd.Timestamp(as_of) - pd.to_timedelta(rng.integers(30, 2001, n), unit="D")
+    end_date = start_date + pd.to_timedelta(rng.integers(100, 1001, n), unit="D")
+    return pd.DataFrame({
+        "customer_id": np.repeat(customer_ids, per_customer),
+        "account_id": unique_account_ids(first_account, n, seed),
+        "account_type": ACCOUNT_TYPES[rng.integers(0, len(ACCOUNT_TYPES), n)],
+        "is_active": is_active,
+        "start_date": start_date.normalize(),
+        "end_date": end_date.normalize().where(is_active == "INACTIVE"),
+    })
+
+
+def generate_month_balances(accounts: pd.DataFrame, year: int, month: int,
+                            rng: np.random.Generator) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    End-of-day balances of every account for one month: an initial 500-5000 balance, then daily
+    -500..500 credits/debits, never below zero. Returns the DAILY_BALANCE rows and the
+    (accounts x days) balance matrix.
+    """
     days = monthrange(year, month)[1]
-    balances = []
-    # start with an initial balance
-    balance = random.uniform(500.0, 5000.0)
-    for day in range(1, days+1):
-        # simulate credit/debit transactions
-        net_change = random.uniform(-500, 500)  # could be negative (debit) or positive (credit)
-        balance = max(0, balance + net_change)  # no negative balances
-        balances.append({
-            "customer_id": customer_id,
-            "account_id": account_id,
-            "date": date(year, month, day),
-            "end_of_day_balance": round(balance, 2)
-        })
-    return balances
-
-daily_balance_records = []
-for _, acc in cust_accounts.iterrows():
-    daily_balance_records.extend(simulate_month_balances(acc["customer_id"], acc["account_id"], 2025, 7))
-    daily_balance_records.extend(simulate_month_balances(acc["customer_id"], acc["account_id"], 2025, 8))
-
-daily_balance = pd.DataFrame(daily_balance_records)
+    n = len(accounts)
+    balances = clipped_random_walk(rng.uniform(500.0, 5000.0, n), rng.uniform(-500, 500, (n, days))).round(2)
+    dates = pd.date_range(date(year, month, 1), periods=days, freq="D").to_numpy()
+    daily = pd.DataFrame({
+        "customer_id": np.repeat(accounts["customer_id"].to_numpy(), days),
+        "account_id": np.repeat(accounts["account_id"].to_numpy(), days),
+        "date": np.tile(dates, n),
+        "end_of_day_balance": balances.ravel(),
+    })
+    return daily, balances
 
-# -----------------------------
-# Compute monthly averages for July and August
-# -----------------------------
-daily_balance['month'] = pd.to_datetime(daily_balance['date']).dt.to_period('M')
 
-avg_balances = daily_balance.groupby(['customer_id', 'account_id', 'month'])['end_of_day_balance'].mean().reset_index()
-avg_balances.rename(columns={'end_of_day_balance': 'average_daily_balance'}, inplace=True)
+def generate_monthly_amb(accounts: pd.DataFrame, balances: np.ndarray, year: int, month: int, as_of: date) -> pd.DataFrame:
+    """MONTHLY_AMB: mean of the month's end-of-day balances per account"""
+    return pd.DataFrame({
+        "customer_id": accounts["customer_id"].to_numpy(),
+        "account_id": accounts["account_id"].to_numpy(),
+        "reporting_month_yyyymm": f"{year}{month:02d}",
+        "average_monthly_balance": balances.mean(axis=1).round(2),
+        "date_computed": pd.Timestamp(as_of),
+    })
 
-# merge back if you want them as columns in daily_balance too (optional)
-# daily_balance = daily_balance.merge(avg_balances, on=['customer_id','account_id','month'], how='left')
 
-# -----------------------------
-# MONTHLY_AMB only for July, using July's daily balances
-# -----------------------------
-july_daily = daily_balance[daily_balance['month'] == '2025-07']
-monthly_amb_records = (
-    july_daily.groupby(['customer_id','account_id'])['end_of_day_balance']
-    .mean()
-    .reset_index()
-)
-
-monthly_amb_records['reporting_month_yyyymm'] = '202507'
-monthly_amb_records['average_monthly_balance'] = monthly_amb_records['end_of_day_balance'].round(2)
-monthly_amb_records['date_computed'] = datetime.now().date()
-monthly_amb = monthly_amb_records[['customer_id','account_id','reporting_month_yyyymm','average_monthly_balance','date_computed']]
+def generate(customer_ids: np.ndarray, months: List[Tuple[int, int]], seed: int = 42, as_of: Optional[date] = None,
+             chunk_customers: int = 50_000) -> Iterator[Dict[str, pd.DataFrame]]:
+    """
+    Yield {"cust_accounts", "daily_balance", "monthly_amb"} frames chunk by chunk (chunk_customers customers at a time).
+    MONTHLY_AMB covers every month but the last one, which is still in progress.
+    The same seed, as_of and chunk_customers always produce the same data.
+    """
+    as_of = as_of or date.today()
+    next_account = 0
+    for chunk_no, start in enumerate(range(0, len(customer_ids), chunk_customers)):
+        #One independent stream per chunk: the output does not depend on how far earlier chunks drew
+        rng = np.random.default_rng([seed, chunk_no])
+        accounts = generate_cust_accounts(customer_ids[start:start + chunk_customers], rng, as_of, next_account, seed)
+        next_account += len(accounts)
+
+        daily_parts, amb_parts = [], []
+        for i, (year, month) in enumerate(months):
+            daily, balances = generate_month_balances(accounts, year, month, rng)
+            daily_parts.append(daily)
+            if i < len(months) - 1:
+                amb_parts.append(generate_monthly_amb(accounts, balances, year, month, as_of))
+        yield {
+            "cust_accounts": accounts,
+            "daily_balance": pd.concat(daily_parts, ignore_index=True),
+            "monthly_amb": pd.concat(amb_parts, ignore_index=True) if amb_parts else None,
+        }
+
 
 # -----------------------------
-# Save all to CSVs
+# Chunked writers
 # -----------------------------
-cust_accounts.to_csv("../sample_data/cust_accounts.csv", index=False)
-daily_balance.to_csv("../sample_data/daily_balance.csv", index=False)
-monthly_amb.to_csv("../sample_data/monthly_amb.csv", index=False)
+class ChunkWriter:
+    """
+    Append chunks of one table to out_dir/<table>.<fmt>.
+    csv / parquet grow a single file; sas7bdat / xpt (pyreadstat) cannot be appended to,
+    so each chunk becomes its own <table>_partNNNN file.
+    """
+
+    def __init__(self, out_dir: str, table: str, fmt: str):
+        if fmt == "parquet" and pq is None:
+            raise ImportError("pyarrow is required for --format parquet (pip install pyarrow)")
+        if fmt in ("sas7bdat", "xpt") and pyreadstat is None:
+            raise ImportError(f"pyreadstat is required for --format {fmt} (pip install pyreadstat)")
+        self.out_dir, self.table, self.fmt = out_dir, table, fmt
+        self.path = os.path.join(out_dir, f"{table}.{fmt}")
+        self.parts = 0
+        self.rows = 0
+        self._writer = None
+
+    @staticmethod
+    def _arrow_table(df: pd.DataFrame):
+        #Date columns are midnight timestamps in pandas; written as plain dates (YYYY-MM-DD / date32)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        schema = pa.schema([pa.field(f.name, pa.date32()) if pa.types.is_timestamp(f.type) else f for f in table.schema])
+        return table.cast(schema)
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.fmt == "csv" and pa_csv is not None:
+            #Arrow's multi-threaded CSV writer, several times faster than DataFrame.to_csv
+            with open(self.path, "wb" if self.parts == 0 else "ab") as f:
+                if self.parts == 0:
+                    #Arrow always quotes header names; keep the plain header of the sample_data files
+                    f.write((",".join(df.columns) + "\n").encode("utf-8"))
+                #Generated values never contain separators or quotes, so nothing needs quoting
+                pa_csv.write_csv(self._arrow_table(df), f, pa_csv.WriteOptions(include_header=False, quoting_style="none"))
+        elif self.fmt == "csv":
+            df.to_csv(self.path, mode="w" if self.parts == 0 else "a", header=self.parts == 0, index=False, date_format="%Y-%m-%d")
+        elif self.fmt == "parquet":
+            table = self._arrow_table(df)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            part = os.path.join(self.out_dir, f"{self.table}_part{self.parts:04d}.{self.fmt}")
+            (pyreadstat.write_sas7bdat if self.fmt == "sas7bdat" else pyreadstat.write_xport)(df, part)
+        self.parts += 1
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def write_synthetic_data(out_dir: str, scale: float = 1.0, seed: int = 42, fmt: str = "csv",
+                         months: Optional[List[Tuple[int, int]]] = None, as_of: Optional[date] = None,
+                         customer_ids: Optional[np.ndarray] = None, chunk_customers: int = 50_000) -> Dict[str, int]:
+    """Generate CUST_ACCOUNTS, DAILY_BALANCE and MONTHLY_AMB for int(1000 * scale) customers; returns rows per table"""
+    if customer_ids is None:
+        customer_ids = np.arange(1001, 1001 + int(1000 * scale))
+    months = months or [(2025, 7), (2025, 8)]
+    os.makedirs(out_dir, exist_ok=True)
+    writers = {t: ChunkWriter(out_dir, t, fmt) for t in ("cust_accounts", "daily_balance", "monthly_amb")}
+    try:
+        for frames in generate(customer_ids, months, seed, as_of, chunk_customers):
+            for table, df in frames.items():
+                if df is not None:
+                    writers[table].write(df)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {table: writer.rows for table, writer in writers.items()}
+
+
+def _month(text: str) -> Tuple[int, int]:
+    return int(text[:4]), int(text[-2:])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate CUST_ACCOUNTS, DAILY_BALANCE and MONTHLY_AMB test data")
+    parser.add_argument("--out-dir", default="../sample_data")
+    parser.add_argument("--scale", type=float, default=1.0, help="1 = 1000 customers")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", default="csv", choices=["csv", "parquet", "sas7bdat", "xpt"])
+    parser.add_argument("--months", nargs="*", default=["202507", "202508"], help="YYYYMM months of daily balances")
+    parser.add_argument("--as-of", default=None, help="Generation date (YYYY-MM-DD), default today; fix it for reproducible output")
+    parser.add_argument("--customers", default=None,
+                        help="CSV with a customer_id column to take the ids from (e.g. ../sample_data/customers.csv)")
+    parser.add_argument("--chunk-customers", type=int, default=50_000, help="Customers generated (and held in memory) per chunk")
+    args = parser.parse_args(argv)
+
+    customer_ids = None
+    if args.customers:
+        customer_ids = pd.read_csv(args.customers, usecols=["customer_id"])["customer_id"].to_numpy()
+        customer_ids = customer_ids[:int(1000 * args.scale)]
+    as_of = date.fromisoformat(args.as_of) if args.as_of else None
+
+    rows = write_synthetic_data(args.out_dir, args.scale, args.seed, args.format, [_month(m) for m in args.months],
+                                as_of, customer_ids, args.chunk_customers)
+    print(f"Synthetic data created in {args.out_dir} ({args.format}): "
+          + ", ".join(f"{table.upper()} {n:,} rows" for table, n in rows.items()))
+    return 0
+
 
-print("Synthetic data created for CUST_ACCOUNTS, DAILY_BALANCE (Jul+Aug) and MONTHLY_AMB (Jul).")
+if __name__ == "__main__":
+    sys.exit(main())
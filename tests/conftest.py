@@ -0,0 +1,24 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from transforms import SAS_EPOCH
+
+
+@pytest.fixture
+def daily_balance():
+    """(SAS-shaped, Snowflake-shaped) copies of the same daily_balance rows: float ids and day offsets vs ints and dates"""
+    rows = 1000
+    dates = pd.Timestamp("2025-07-01") + pd.to_timedelta(np.arange(rows) % 31, unit="D")
+    sf = pd.DataFrame({
+        "customer_id": np.arange(rows) + 1001,
+        "account_id": [f"A{i}" for i in range(rows)],
+        "date": dates,
+        "end_of_day_balance": np.arange(rows) * 1.5,
+    })
+    sas = sf.assign(customer_id=sf["customer_id"].astype("float64"), date=(dates - SAS_EPOCH).days.astype("float64"))
+    return sas, sf
@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+from incremental import PartitionStore, validate_incremental
+from knowledge_base import MAPPINGS, generate_validation_tests
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PartitionStore(str(tmp_path / "partitions.db"))
+    yield store
+    store.close()
+
+
+def _run(store, sas, sf, sf_version):
+    return validate_incremental(store, "daily_balance", generate_validation_tests("daily_balance"), sas, sf,
+                                MAPPINGS["daily_balance"], sas_version="sas-1", sf_version=sf_version)
+
+
+def _statuses(report):
+    return {(r["test_name"], r.get("column")): r["status"] for r in report["results"]}
+
+
+def test_unchanged_source_reuses_every_partition(store, daily_balance):
+    sas, sf = daily_balance
+    first = _run(store, sas, sf, "sf-1")
+    assert len(first["incremental"]["sf"]["recomputed"]) == 31
+    second = _run(store, sas, sf, "sf-1")
+    assert second["incremental"]["sf"]["recomputed"] == []
+    assert second["incremental"]["sas"]["recomputed"] == []
+    assert set(_statuses(second).values()) == {"PASS"}
+
+
+def test_content_only_edit_recomputes_and_fails_its_partition(store, daily_balance):
+    sas, sf = daily_balance
+    _run(store, sas, sf, "sf-1")
+
+    #Same rows, same partitions: only one value differs
+    edited = sf.copy()
+    edited.loc[10, "end_of_day_balance"] += 1
+    label = edited.loc[10, "date"].strftime("%Y-%m-%d")
+    report = _run(store, sas, edited, "sf-2")
+    assert report["incremental"]["sf"]["recomputed"] == [label]
+    statuses = _statuses(report)
+    assert statuses[("partition_digest", label)] == "FAIL"
+    assert [p for p, s in statuses.items() if s == "FAIL"] == [("partition_digest", label)]
+
+    #Fresh store, same data: the same verdict
+    fresh = PartitionStore(":memory:")
+    try:
+        assert _statuses(_run(fresh, sas, edited, "sf-2")) == statuses
+    finally:
+        fresh.close()
+
+
+def test_updated_at_does_not_hide_content_edits(store):
+    mapping = MAPPINGS["monthly_amb"]
+    sf = pd.DataFrame({
+        "customer_id": [1, 2, 3, 4],
+        "account_id": ["a", "b", "c", "d"],
+        "reporting_month_yyyymm": [202507, 202507, 202508, 202508],
+        "average_monthly_balance": [10.0, 20.0, 30.0, 40.0],
+        "date_computed": pd.to_datetime(["2025-08-01"] * 2 + ["2025-09-01"] * 2),
+    })
+    tests = generate_validation_tests("monthly_amb")
+    validate_incremental(store, "monthly_amb", tests, sf, sf, mapping, sas_version="1", sf_version="1")
+
+    #date_computed and the row count are left as they were
+    edited = sf.assign(average_monthly_balance=[10.0, 20.0, 30.0, 41.0])
+    report = validate_incremental(store, "monthly_amb", tests, sf, edited, mapping, sas_version="1", sf_version="2")
+    assert report["incremental"]["sf"]["recomputed"] == ["202508"]
+    assert _statuses(report)[("partition_digest", "202508")] == "FAIL"
+
+
+def test_distinct_counts_stay_exact_without_approx_error(store, daily_balance):
+    sas, sf = daily_balance
+    tests = [{"name": "distinct_cust", "sql": "", "tolerance": 0}]
+    mapping = dict(MAPPINGS["daily_balance"], columns=MAPPINGS["daily_balance"]["columns"]
+                   + [{"src": "cust_id", "tgt": "cust_id"}])
+    sas, sf = sas.assign(cust_id=sas["customer_id"]), sf.assign(cust_id=sf["customer_id"])
+    report = validate_incremental(store, "daily_balance", tests, sas, sf, mapping)
+    result = report["results"][0]
+    assert "approx_error" not in tests[0]
+    assert result["sas_value"] == result["sf_value"] == sf["cust_id"].nunique()
@@ -0,0 +1,38 @@
+from concurrent.futures import Future
+
+import pytest
+
+from lineage_scheduler import _critical_path, run_scheduled, table_failed
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def test_critical_path_handles_long_chains():
+    deps = {f"t{i}": {f"t{i - 1}"} if i else set() for i in range(20_000)}
+    length = _critical_path(deps)
+    assert length["t0"] == 20_000
+    assert length["t19999"] == 1
+
+
+def test_critical_path_rejects_cycles():
+    with pytest.raises(ValueError, match="cycle"):
+        _critical_path({"a": {"b"}, "b": {"a"}, "c": set()})
+
+
+def test_tables_downstream_of_a_failure_are_skipped():
+    deps = {"raw": set(), "stg": {"raw"}, "mart": {"stg"}, "other": set()}
+    status = {"raw": "FAIL", "other": "PASS"}
+    started = []
+
+    def submit(table):
+        started.append(table)
+        return _done({"table": table, "results": [{"status": status.get(table, "PASS")}]})
+
+    results = run_scheduled(deps, submit, max_in_flight=2, failed=table_failed)
+    assert sorted(started) == ["other", "raw"]
+    assert "raw" in results["stg"]["skipped"]
+    assert "raw" in results["mart"]["skipped"]
@@ -0,0 +1,45 @@
+from knowledge_base import MAPPINGS
+from row_compare import compare_row_hashes, diff_by_key, merkle_localize
+
+
+def _drop_and_change(sf):
+    """Snowflake side with row A5 missing and A10's balance changed"""
+    sf = sf.drop(index=5)
+    sf.loc[10, "end_of_day_balance"] = -1.0
+    return sf
+
+
+def test_identical_sides_match_after_normalization(daily_balance):
+    sas, sf = daily_balance
+    result = compare_row_hashes(sas, sf, MAPPINGS["daily_balance"])
+    assert (result["matched"], result["missing"], result["extra"], result["changed"]) == (len(sf), 0, 0, 0)
+
+
+def test_diff_by_key_reports_missing_and_changed_rows(daily_balance, tmp_path):
+    sas, sf = daily_balance
+    result = diff_by_key(sas, _drop_and_change(sf), MAPPINGS["daily_balance"], partitions=8, workdir=str(tmp_path))
+    assert (result["missing"], result["extra"], result["changed_rows"]) == (1, 0, 1)
+    assert result["column_mismatches"] == {"end_of_day_balance": 1}
+
+    report = result["report"].set_index("account_id")
+    assert report.loc["A5", "column"] == "<row>"
+    assert report.loc["A10", "column"] == "end_of_day_balance"
+    assert float(report.loc["A10", "sas_value"]) == 15.0
+    assert float(report.loc["A10", "sf_value"]) == -1.0
+
+
+def test_diff_by_key_routes_cast_keys_of_both_sides_together(daily_balance, tmp_path):
+    sas, sf = daily_balance
+    #Text ids on one side, floats on the other: CAST makes them the same key
+    sf = sf.assign(customer_id=sf["customer_id"].astype(str))
+    result = diff_by_key(sas, sf, MAPPINGS["daily_balance"], partitions=8, workdir=str(tmp_path))
+    assert (result["rows_compared"], result["missing"], result["extra"], result["changed_rows"]) == (len(sf), 0, 0, 0)
+
+
+def test_merkle_localize_finds_missing_and_changed_rows(daily_balance):
+    sas, sf = daily_balance
+    result = merkle_localize(sas, _drop_and_change(sf), MAPPINGS["daily_balance"], leaf_rows=32)
+    assert (result["missing"], result["extra"], result["changed"]) == (1, 0, 1)
+    assert result["missing_keys"]["account_id"].tolist() == ["A5"]
+    assert result["changed_keys"]["account_id"].tolist() == ["A10"]
+    assert result["rows_examined"] < len(sas)
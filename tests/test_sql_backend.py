@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from knowledge_base import generate_validation_tests
+from sql_backend import batch_queries, embedded_pool, load_extract, run_batched
+
+
+@pytest.fixture
+def pool():
+    pool = embedded_pool()
+    with pool.connection() as con:
+        load_extract(con, "landing.customer", pd.DataFrame({"cust_id": [1, 2, 2], "email": ["a@x", None, "b@x"]}))
+        #No amount column: SUM(amount) cannot bind
+        load_extract(con, "landing.transaction", pd.DataFrame({"tran_id": [1, 2], "cust_id": [1, 1]}))
+    yield pool
+    pool.close()
+
+
+def test_batch_queries_merge_one_table_into_one_select():
+    queries = batch_queries(generate_validation_tests("transaction"))
+    assert len(queries) == 1
+    assert queries[0][0].startswith("SELECT COUNT(*) AS v0, SUM(amount) AS v1")
+
+
+def test_failing_table_is_reported_and_the_others_still_run(pool):
+    values, errors = run_batched(pool, {t: generate_validation_tests(t) for t in ["transaction", "customer"]})
+    assert set(errors) == {"transaction"}
+    assert "amount" in errors["transaction"]
+    assert values == {"customer": {("count", None): 3, ("nulls", "email"): 1, ("nunique", "cust_id"): 2}}
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from validation_engine import RunningAggregates, compile_plan, execute_plan
+
+
+VALIDATIONS = [
+    {"rule": "Row Count"},
+    {"rule": "Sum Amount", "column": "amount"},
+    {"rule": "Distinct Count", "column": "cust_id"},
+    {"rule": "Not Null", "column": "email"},
+    {"rule": "Uniqueness", "column": "tran_id"},
+    {"rule": "Uniqueness", "column": "cust_id"},
+]
+
+
+def _frame(rows: int = 5000) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({
+        "tran_id": np.arange(rows),
+        "cust_id": rng.integers(0, 300, rows),
+        "amount": rng.uniform(0, 100, rows).round(2),
+        "email": pd.Series([f"u{i}@x.com" for i in range(rows)]).mask(rng.random(rows) < 0.05),
+    })
+
+
+def test_one_pass_plan_matches_per_rule_plans():
+    df = _frame()
+    combined = execute_plan(compile_plan(VALIDATIONS), df)
+    for val in VALIDATIONS:
+        single = execute_plan(compile_plan([val]), df)
+        for spec, value in single.items():
+            assert combined[spec] == value
+
+
+def test_one_pass_plan_matches_pandas():
+    df = _frame()
+    result = execute_plan(compile_plan(VALIDATIONS), df)
+    assert result[("count", None)] == len(df)
+    assert np.isclose(result[("sum", "amount")], df["amount"].sum())
+    assert result[("nunique", "cust_id")] == df["cust_id"].nunique()
+    assert result[("nulls", "email")] == df["email"].isna().sum()
+    assert result[("unique", "tran_id")] is True
+    assert result[("unique", "cust_id")] is False
+
+
+def test_chunked_running_aggregates_match_whole_frame():
+    df = _frame()
+    plan = compile_plan(VALIDATIONS)
+    running = RunningAggregates(plan)
+    for start in range(0, len(df), 777):
+        running.update(df.iloc[start:start + 777])
+    whole = execute_plan(plan, df)
+    chunked = running.result()
+    assert chunked.keys() == whole.keys()
+    for spec, value in whole.items():
+        assert np.isclose(chunked[spec], value) if spec[0] == "sum" else chunked[spec] == value
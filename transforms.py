@@ -0,0 +1,134 @@
+import hashlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------
+# Vectorized converters for the MAPPINGS transforms
+# ---------------------------
+#Each mapped column compiles into a (SAS converter, Snowflake converter) pair that turns
+#both sides into the same representation before validation.
+SAS_EPOCH = pd.Timestamp("1960-01-01")
+TRUE_STRINGS = {"true", "t", "1", "1.0", "y", "yes"}
+FALSE_STRINGS = {"false", "f", "0", "0.0", "n", "no"}
+
+Converter = Callable[[pd.Series], pd.Series]
+
+
+def sas_date_to_datetime(s: pd.Series) -> pd.Series:
+    """SAS DATE (days since 1960-01-01) → datetime64 at midnight; already-converted dates are just floored"""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.normalize()
+    return SAS_EPOCH + pd.to_timedelta(pd.to_numeric(s, errors="coerce"), unit="D")
+
+
+def sas_datetime_to_timestamp(s: pd.Series) -> pd.Series:
+    """SAS DATETIME (seconds since 1960-01-01) → datetime64"""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    return SAS_EPOCH + pd.to_timedelta(pd.to_numeric(s, errors="coerce"), unit="s")
+
+
+def to_date(s: pd.Series) -> pd.Series:
+    return pd.to_datetime(s, errors="coerce").dt.normalize()
+
+
+def to_timestamp(s: pd.Series) -> pd.Series:
+    return pd.to_datetime(s, errors="coerce")
+
+
+def to_boolean(s: pd.Series) -> pd.Series:
+    """0/1, True/False or 'TRUE'/'false'/'Y'... → nullable boolean"""
+    if pd.api.types.is_bool_dtype(s):
+        return s.astype("boolean")
+    if pd.api.types.is_numeric_dtype(s):
+        return (s != 0).astype("boolean").mask(s.isna())
+    lowered = s.astype("string").str.strip().str.lower()
+    return lowered.isin(TRUE_STRINGS).astype("boolean").mask(~lowered.isin(TRUE_STRINGS | FALSE_STRINGS))
+
+
+def to_number(s: pd.Series) -> pd.Series:
+    """
+    CAST: numeric on both sides; Int64 when every value is integral (1001.0 and '1001' compare equal).
+    Blanks become missing; any other non-numeric value raises instead of silently turning into NaN.
+    """
+    values = pd.to_numeric(s, errors="coerce")
+    coerced = values.isna() & s.notna()
+    if coerced.any():
+        text = s[coerced].astype("string").str.strip()
+        bad = text[text != ""]
+        if len(bad):
+            raise ValueError(f"CAST of column {s.name!r}: {len(bad)} non-numeric values, e.g. {bad.unique()[:3].tolist()}")
+    valid = values.dropna()
+    if len(valid) and np.all(np.mod(valid.to_numpy(dtype="float64"), 1) == 0):
+        return values.astype("Int64")
+    return values.astype("float64")
+
+
+def hash_email(s: pd.Series, algorithm: str = "sha256") -> pd.Series:
+    """
+    Mask clear-text emails the way the Snowflake load does: hex digest of the trimmed, lower-cased value.
+    The digest runs once per distinct email (factorize), not once per row.
+    """
+    codes, uniques = pd.factorize(s.astype("string").str.strip().str.lower())
+    digests = np.array([hashlib.new(algorithm, u.encode("utf-8")).hexdigest() for u in uniques], dtype=object)
+    out = pd.Series(np.where(codes >= 0, digests[codes] if len(digests) else None, None), index=s.index)
+    return out.astype("string")
+
+
+def normalize_hash(s: pd.Series) -> pd.Series:
+    return s.astype("string").str.strip().str.lower()
+
+
+TRANSFORMS: Dict[str, Tuple[Converter, Converter]] = {
+    "SAS_DATE_TO_DATE": (sas_date_to_datetime, to_date),
+    "SAS_DATETIME_TO_TIMESTAMP": (sas_datetime_to_timestamp, to_timestamp),
+    "0/1 to BOOLEAN": (to_boolean, to_boolean),
+    "CAST": (to_number, to_number),
+}
+MASKINGS: Dict[str, Tuple[Converter, Converter]] = {
+    "hash_email": (hash_email, normalize_hash),
+}
+
+
+def compile_mapping(mapping: Dict) -> List[Tuple[str, str, Converter, Converter]]:
+    """(src column, tgt column, SAS converter, Snowflake converter) for every mapped column that needs one"""
+    compiled = []
+    for col in mapping["columns"]:
+        for key, registry in (("transform", TRANSFORMS), ("masking", MASKINGS)):
+            name = col.get(key)
+            if name is None:
+                continue
+            if name not in registry:
+                raise ValueError(f"Unknown {key} '{name}' for column {col['src']}")
+            compiled.append((col["src"], col["tgt"], *registry[name]))
+    return compiled
+
+
+def normalize_side(df: pd.DataFrame, mapping: Optional[Dict], side: str,
+                   converters: Optional[List[Tuple[str, str, Converter, Converter]]] = None) -> pd.DataFrame:
+    """Apply a table's compiled transforms to one side ("sas" or "sf") only, e.g. when each side is read separately"""
+    if mapping is None:
+        return df
+    converters = converters if converters is not None else compile_mapping(mapping)
+    by_lower = {c.lower(): c for c in df.columns}
+    new = {}
+    for src, tgt, sas_conv, sf_conv in converters:
+        col, conv = (src, sas_conv) if side == "sas" else (tgt, sf_conv)
+        if col.lower() in by_lower:
+            name = by_lower[col.lower()]
+            new[name] = conv(df[name])
+    return df.assign(**new)
+
+
+def normalize_frames(sas_df: pd.DataFrame, sf_df: pd.DataFrame, mapping: Optional[Dict],
+                     converters: Optional[List[Tuple[str, str, Converter, Converter]]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Apply a table's compiled transforms to both frames (column names matched case-insensitively,
+    each side keeps its own names). Unmapped columns are passed through untouched.
+    """
+    if mapping is None:
+        return sas_df, sf_df
+    converters = converters if converters is not None else compile_mapping(mapping)
+    return normalize_side(sas_df, mapping, "sas", converters), normalize_side(sf_df, mapping, "sf", converters)
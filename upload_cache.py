@@ -0,0 +1,83 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+
+# ---------------------------
+# Content-addressed cache of parsed uploads
+# ---------------------------
+#Streamlit reruns the whole script on every widget interaction; the parsed frames are cached
+#by the hash of the uploaded bytes so each file is read and decoded only once.
+DEFAULT_BUDGET_MB = int(os.environ.get("UPLOAD_CACHE_MB", "2048"))
+DEFAULT_SPILL_DIR = os.environ.get("UPLOAD_CACHE_SPILL_DIR") or None
+
+
+def content_key(data, tag: str = "") -> str:
+    """Hash of the uploaded bytes (bytes or memoryview, e.g. UploadedFile.getbuffer()) plus the parse options"""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(tag.encode("utf-8"))
+    h.update(b"\0")
+    h.update(data)
+    return h.hexdigest()
+
+
+class UploadCache:
+    """
+    LRU cache of parsed DataFrames bounded by an in-memory budget.
+    Evicted frames are pickled to spill_dir (when set) and reloaded from there on the next hit.
+    Cached frames are shared between reruns/sessions, so callers must treat them as read-only.
+    """
+
+    def __init__(self, budget_mb: int = DEFAULT_BUDGET_MB, spill_dir: Optional[str] = DEFAULT_SPILL_DIR):
+        self.budget = budget_mb * 1024 * 1024
+        self.spill_dir = spill_dir
+        self._entries = OrderedDict()  # key -> (frame, size in bytes)
+        self._used = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.pkl")
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+        if self.spill_dir and os.path.exists(self._spill_path(key)):
+            df = pd.read_pickle(self._spill_path(key))
+            self.put(key, df)
+            with self._lock:
+                self.hits += 1
+            return df
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True, index=True).sum())
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self._used -= self._entries.pop(key)[1]
+            self._entries[key] = (df, size)
+            self._used += size
+            #Evict least recently used entries until within budget (always keep the newest one)
+            while self._used > self.budget and len(self._entries) > 1:
+                old_key, (old_df, old_size) = self._entries.popitem(last=False)
+                self._used -= old_size
+                evicted.append((old_key, old_df))
+        for old_key, old_df in evicted:
+            if self.spill_dir and not os.path.exists(self._spill_path(old_key)):
+                old_df.to_pickle(self._spill_path(old_key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "memory_mb": round(self._used / 1024 / 1024, 1),
+                    "budget_mb": round(self.budget / 1024 / 1024, 1), "hits": self.hits, "misses": self.misses}
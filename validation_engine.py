@@ -0,0 +1,220 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from sas_io import iter_sas_chunks
+from sketches import HyperLogLog
+from transforms import compile_mapping, normalize_side
+
+# ---------------------------
+# Aggregates behind the validation rules
+# ---------------------------
+#Every rule in app.py (test names) and app2.py (rule labels) boils down to one
+#aggregate over one column (None = whole table).
+AggSpec = Tuple[str, Optional[str]]
+
+TEST_AGGREGATES = {
+    "row_count": ("count", None),
+    "sum_amount": ("sum", "amount"),
+    "distinct_cust": ("nunique", "cust_id"),
+    "null_email": ("nulls", "email"),
+}
+
+RULE_AGGREGATES = {
+    "Row Count": "count",
+    "Sum Amount": "sum",
+    "Distinct Count": "nunique",
+    "Not Null": "nulls",
+    "Uniqueness": "unique",
+}
+
+
+def rule_aggregate(val: Dict) -> Optional[AggSpec]:
+    """Aggregate needed by a test (app.py) or a validation entry (app2.py); None if it is not an aggregate rule"""
+    if "name" in val:
+        return TEST_AGGREGATES.get(val["name"])
+    agg = RULE_AGGREGATES.get(val.get("rule"))
+    if agg is None:
+        return None
+    return (agg, None) if agg == "count" else (agg, val["column"])
+
+
+def rule_aggregates(validations: Iterable[Dict]) -> List[AggSpec]:
+    """Distinct aggregates needed by a list of tests / validations, in first-seen order"""
+    specs = []
+    for val in validations:
+        spec = rule_aggregate(val)
+        if spec is not None and spec not in specs:
+            specs.append(spec)
+    return specs
+
+
+# ---------------------------
+# Validation planner: all rules → one pass per dataset
+# ---------------------------
+def compile_plan(validations: Iterable[Dict]) -> Dict[Optional[str], List[str]]:
+    """
+    Compile tests (generate_validation_tests) or validation entries (validations_list)
+    into one plan: the deduplicated aggregates needed, grouped per column.
+    The None key holds table-level aggregates (row count).
+    """
+    plan = {}
+    for agg, col in rule_aggregates(validations):
+        plan.setdefault(col, []).append(agg)
+    return plan
+
+
+class RunningAggregates:
+    """
+    Computes every aggregate of a plan in a single pass over a DataFrame, and can
+    fold further chunks into the same running values, so a table never has to be
+    materialized in full. Memory is set by the chunk size, except for
+    nunique/unique which keep the distinct values of their column.
+    With approx_error, nunique uses a fixed-size HyperLogLog sketch instead, within
+    ~approx_error relative error; running values of chunks, files or workers can be merged.
+    """
+
+    def __init__(self, plan: Dict[Optional[str], List[str]], approx_error: Optional[float] = None):
+        self.plan = plan
+        self.approx_error = approx_error
+        self.rows = 0
+        self._sums = {}
+        self._nulls = {}
+        self._distinct = {}
+        self._dupes = {}
+        self._sketches = {}
+        for col, aggs in plan.items():
+            if col is None:
+                continue
+            if "sum" in aggs:
+                self._sums[col] = 0.0
+            self._nulls[col] = 0
+            if approx_error is not None and "nunique" in aggs:
+                self._sketches[col] = HyperLogLog.for_error(approx_error)
+            #Uniqueness stays exact: a single duplicate must fail it
+            if "unique" in aggs or ("nunique" in aggs and col not in self._sketches):
+                self._distinct[col] = set()
+                self._dupes[col] = False
+
+    def update(self, chunk: pd.DataFrame) -> "RunningAggregates":
+        self.rows += len(chunk)
+        for col in self._nulls:
+            #Each column is touched once; its aggregates share the null mask
+            s = chunk[col]
+            notna = s.notna()
+            n_valid = int(notna.sum())
+            self._nulls[col] += len(s) - n_valid
+            if col in self._sums:
+                self._sums[col] += s.astype(float).sum()
+            if col in self._distinct:
+                seen = self._distinct[col]
+                values = s[notna].unique()
+                before = len(seen)
+                seen.update(values)
+                #A duplicate exists if this chunk repeats a value, or repeats one from an earlier chunk
+                if len(values) < n_valid or len(seen) < before + len(values):
+                    self._dupes[col] = True
+            if col in self._sketches:
+                self._sketches[col].add(s[notna])
+        return self
+
+    def merge(self, other: "RunningAggregates") -> "RunningAggregates":
+        """Fold in the running values of the same plan computed over other rows"""
+        self.rows += other.rows
+        for col in self._sums:
+            self._sums[col] += other._sums[col]
+        for col in self._nulls:
+            self._nulls[col] += other._nulls[col]
+        for col, seen in self._distinct.items():
+            theirs = other._distinct[col]
+            before = len(seen)
+            seen.update(theirs)
+            if other._dupes[col] or len(seen) < before + len(theirs):
+                self._dupes[col] = True
+        for col, sketch in self._sketches.items():
+            sketch.merge(other._sketches[col])
+        return self
+
+    def value(self, spec: AggSpec):
+        agg, col = spec
+        if agg == "count":
+            return self.rows
+        if agg == "sum":
+            return self._sums[col]
+        if agg == "nulls":
+            return self._nulls[col]
+        if agg == "nunique":
+            if col in self._sketches:
+                return round(self._sketches[col].estimate())
+            return len(self._distinct[col])
+        if agg == "unique":
+            #Same semantics as Series.is_unique: NaN counts as a value too
+            return not self._dupes[col] and self._nulls[col] <= 1
+        raise ValueError(f"Unknown aggregate: {agg}")
+
+    def result(self) -> Dict[AggSpec, object]:
+        return {(agg, col): self.value((agg, col)) for col, aggs in self.plan.items() for agg in aggs}
+
+
+def execute_plan(plan: Dict[Optional[str], List[str]], df: pd.DataFrame,
+                 approx_error: Optional[float] = None) -> Dict[AggSpec, object]:
+    """Compute every aggregate of the plan with a single pass over an in-memory frame"""
+    #A whole frame has nothing to merge: exact distinct counts / uniqueness use pandas' hash
+    #tables (Series.nunique / is_unique) instead of the running sets kept for chunks
+    exact = {col: [a for a in aggs if a == "unique" or (a == "nunique" and approx_error is None)]
+             for col, aggs in plan.items() if col is not None}
+    running = RunningAggregates({col: [a for a in aggs if a not in exact.get(col, ())] for col, aggs in plan.items()},
+                                approx_error).update(df)
+    result = {}
+    for col, aggs in plan.items():
+        for agg in aggs:
+            if agg == "nunique" and agg in exact.get(col, ()):
+                result[(agg, col)] = int(df[col].nunique())
+            elif agg == "unique":
+                result[(agg, col)] = bool(df[col].is_unique)
+            else:
+                result[(agg, col)] = running.value((agg, col))
+    return result
+
+
+def stream_sas_aggregates(sas_file, plan: Dict[Optional[str], List[str]], chunksize: int = 100_000,
+                          approx_error: Optional[float] = None, mapping: Optional[Dict] = None) -> Dict[AggSpec, object]:
+    """
+    Compute the plan's aggregates for a .sas7bdat file chunk by chunk, without loading the full frame.
+    With a mapping every chunk gets the SAS-side transforms first, like normalize_frames does in memory.
+    """
+    running = RunningAggregates(plan, approx_error)
+    converters = compile_mapping(mapping) if mapping is not None else None
+    for chunk in iter_sas_chunks(sas_file, chunksize=chunksize):
+        running.update(normalize_side(chunk, mapping, "sas", converters))
+    return running.result()
+
+
+# ---------------------------
+# Result rows
+# ---------------------------
+def run_validation(test: Dict, sas_aggs: Dict, sf_aggs: Dict) -> Dict:
+    """Run test by comparing the aggregates computed for each side by the validation plan"""
+    result = {"test_name": test["name"], "status": "PASS", "sas_value": None, "sf_value": None, "explanation": ""}
+
+    spec = rule_aggregate(test)
+    result["sas_value"] = sas_aggs[spec]
+    result["sf_value"] = sf_aggs[spec]
+
+    if test["name"] == "sum_amount":
+        result["sas_value"] = round(result["sas_value"], 2)
+        result["sf_value"] = round(result["sf_value"], 2)
+
+    tolerance = test["tolerance"]
+    if test.get("approx_error") and spec[0] == "nunique":
+        #Both sides are sketch estimates: allow each one its error bound on top of the rule's tolerance
+        tolerance += test["approx_error"] * (result["sas_value"] + result["sf_value"])
+
+    # Compare values
+    if abs(result["sas_value"] - result["sf_value"]) > tolerance:
+        result["status"] = "FAIL"
+        result["explanation"] = f"Mismatch found: SAS={result['sas_value']} vs Snowflake={result['sf_value']}."
+    else:
+        result["explanation"] = "Validation passed ✅"
+
+    return result